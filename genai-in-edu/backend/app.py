@@ -1,35 +1,45 @@
 # app.py
 import os
+import json
 import base64
 import cv2
-from focus_tracker import evaluate_frame
+from focus_tracker import evaluate_frame, new_tracker
+from gaze_service import (
+    GazeServiceUnavailable, gaze_service_enabled, gaze_service_running, submit_frame,
+    start_gaze_service, stop_gaze_service
+)
 
 
 from dotenv import load_dotenv
 load_dotenv()
-from response_handler import extract_text_from_pdf, summarize_text, ask_question, classify_intent
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, Request
+from response_handler import summarize_text, ask_question, ask_question_stream, classify_intent
+from fastapi import FastAPI, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import uuid
 import time
-from gtts import gTTS
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from tts_engine import synthesize, audio_url
 import logging
 
 from context_manager import update_context, get_context
+from retrieval import find_relevant_chunks
+from response_cache import make_scope, cache_stats
+from document_store import get_or_create_document, get_document, get_document_summary
 from graph_logger import (
     infer_observed_modality, log_interaction, get_user_disabilities,
     create_user_profile, get_all_users, log_impatience_event,
     get_impatience_history, upsert_user_disability, log_emotional_state,
     get_modality_affinity, log_modality_event, log_focus_score,
-    get_focus_trend_data, get_concept_mastery, delete_user_data
+    get_focus_trend_data, get_concept_mastery, delete_user_data,
+    flush_graph_writes, get_profile_cache_stats
 )
-from response_handler import explain_mistakes, extract_concept
-from video_generator import create_video_from_script
+from response_handler import explain_mistakes, extract_concept, close_llm_client
+from render_queue import enqueue_job, get_job, cancel_job, start_workers, stop_workers
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -55,26 +65,40 @@ def root():
 def health():
     return {"status": "healthy"}
 
-def find_relevant_chunks(query: str, chunks: list, top_k: int = 5):
-    if not chunks:
-        return ""
-    if len(chunks) <= top_k:
-        return " ".join(chunks)
-    try:
-        vectorizer = TfidfVectorizer(stop_words='english')
-        tfidf_matrix = vectorizer.fit_transform(chunks)
-        query_vec = vectorizer.transform([query])
-        similarities = cosine_similarity(query_vec, tfidf_matrix).flatten()
-        top_indices = similarities.argsort()[::-1][:top_k]
-        relevant = [chunks[i] for i in top_indices if similarities[i] > 0]
-        return " ".join(relevant) if relevant else " ".join(chunks[:top_k])
-    except Exception as e:
-        logger.error(f"Error in chunk retrieval: {e}")
-        return " ".join(chunks[:top_k])
+@app.get("/cache-stats")
+def get_cache_stats():
+    return {"responses": cache_stats(), "profiles": get_profile_cache_stats()}
+
+@app.on_event("startup")
+def startup():
+    # Video encodes run in separate worker processes fed by a durable queue;
+    # set RENDER_WORKERS=0 when running `python render_queue.py` elsewhere
+    start_workers()
+    if gaze_service_enabled():
+        # Workers load the face models up front instead of on the first frame
+        start_gaze_service()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_llm_client()
+    await asyncio.to_thread(flush_graph_writes)
+    await asyncio.to_thread(stop_workers)
+    await asyncio.to_thread(stop_gaze_service)
 
 # Session state
 user_sessions = {}
-video_jobs = {}
+# job_id -> {"status", "doc_id" | "error" | "message", "finished_at"}. The
+# extracted text stays in the document store; finished jobs are dropped
+# after UPLOAD_JOB_TTL seconds
+upload_jobs = {}
+UPLOAD_JOB_TTL = int(os.getenv("UPLOAD_JOB_TTL", "3600"))
+
+# PDF parsing/indexing is CPU-bound, keep it off the event loop
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+# Prewarming costs one LLM call per chunk for every upload, so it is opt-in;
+# otherwise the summary is built the first time a student asks for it
+SUMMARIZE_ON_UPLOAD = os.getenv("SUMMARIZE_ON_UPLOAD", "false").lower() == "true"
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="pdf-upload")
 
 class ModalityEvent(BaseModel):
     user_id: str
@@ -116,31 +140,61 @@ def infer_preferred_modality(user_id: str):
         return None
     return affinity[0]["modality"]
 
-@app.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...), user_id: str = Form("user_fallback")):
-    logger.info(f"Received PDF upload request for user {user_id}")
+def process_pdf_task(job_id: str, file_bytes: bytes, user_id: str, loop=None):
     try:
-        file_bytes = await file.read()
-        pdf_text = extract_text_from_pdf(file_bytes)
+        doc = get_or_create_document(file_bytes)
+        pdf_text = doc["text"]
 
         if not pdf_text.strip():
-            return {"text": "", "message": "No text extracted from PDF."}
+            upload_jobs[job_id] = {"status": "completed", "message": "No text extracted from PDF.", "finished_at": time.time()}
+            return
 
-        chunk_size = 300
-        words = pdf_text.split()
-        pdf_chunks = [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-        
-        user_sessions[user_id] = {
+        user_sessions.setdefault(user_id, {}).update({
+            "doc_id": doc["doc_id"],
             "pdf_text": pdf_text,
-            "pdf_chunks": pdf_chunks,
-        }
+            "pdf_chunks": doc["chunks"],
+            "pdf_index": doc["index"],
+        })
+        upload_jobs[job_id] = {"status": "completed", "doc_id": doc["doc_id"], "finished_at": time.time()}
+        if loop is not None and SUMMARIZE_ON_UPLOAD and not doc.get("summary"):
+            # Warm the summary cache so a later "summarize" is instant
+            asyncio.run_coroutine_threadsafe(get_document_summary(doc["doc_id"]), loop)
+    except Exception as e:
+        logger.error(f"Error processing PDF: {str(e)}")
+        upload_jobs[job_id] = {"status": "failed", "error": str(e), "finished_at": time.time()}
 
-        return {"text": pdf_text}
+def _prune_upload_jobs():
+    cutoff = time.time() - UPLOAD_JOB_TTL
+    for job_id, job in list(upload_jobs.items()):
+        if job.get("finished_at", cutoff) < cutoff:
+            upload_jobs.pop(job_id, None)
+
+@app.post("/upload-pdf")
+async def upload_pdf(file: UploadFile = File(...), user_id: str = Form("user_fallback")):
+    logger.info(f"Received PDF upload request for user {user_id}")
+    try:
+        file_bytes = await file.read()
+        _prune_upload_jobs()
+        job_id = str(uuid.uuid4())
+        upload_jobs[job_id] = {"status": "processing"}
+        upload_executor.submit(process_pdf_task, job_id, file_bytes, user_id, asyncio.get_running_loop())
+        return {"job_id": job_id, "status": "processing"}
 
     except Exception as e:
-        logger.error(f"Error processing PDF: {str(e)}")
+        logger.error(f"Error receiving PDF: {str(e)}")
         return {"error": str(e)}
 
+@app.get("/upload-status/{job_id}")
+def get_upload_status(job_id: str):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return {"status": "not_found"}
+    status = {key: value for key, value in job.items() if key != "finished_at"}
+    if job.get("doc_id"):
+        doc = get_document(job["doc_id"])
+        status["text"] = doc["text"] if doc else ""
+    return status
+
 def build_modality_instruction(modality: str):
     if modality == "audio":
         return "Explain as if you are speaking aloud to the student. Use conversational tone, pauses, and examples."
@@ -228,8 +282,12 @@ def resolve_teaching_strategy(disabilities: dict, user_modality: str, observed_m
         return {"effective_modality": observed_modality, "reason": "Inferred preference", "framework": "Behavioral"}
     return {"effective_modality": user_modality, "reason": "User-selected", "framework": "User Control"}
 
-@app.post("/start-focus-session")
-def start_focus(user_id: str = Form(...)):
+# Face detection is CPU-bound; every frame from every client shares this
+# pool, so detector load stays bounded however many students connect
+FOCUS_WORKERS = int(os.getenv("FOCUS_WORKERS", "2"))
+focus_executor = ThreadPoolExecutor(max_workers=FOCUS_WORKERS, thread_name_prefix="focus")
+
+def _start_focus_session(user_id: str):
     if user_id not in user_sessions:
         user_sessions[user_id] = {}
     user_sessions[user_id]["focus"] = {
@@ -237,55 +295,203 @@ def start_focus(user_id: str = Form(...)):
         "frames_attended": 0,
         "frames_distracted": 0,
         "total_frames": 0,
+        "frames_dropped": 0,
+        "tracker": new_tracker(),
         "start_time": time.time()
     }
+
+def _focus_score(focus: dict):
+    if not focus or focus["total_frames"] == 0:
+        return 0.0
+    return round(focus["frames_attended"] / focus["total_frames"] * 100, 2)
+
+def _stop_focus_session(user_id: str):
+    focus = user_sessions.get(user_id, {}).get("focus")
+    frames = 0
+    dropped = 0
+    if focus:
+        focus["active"] = False
+        frames = focus["total_frames"]
+        dropped = focus.get("frames_dropped", 0)
+    score = _focus_score(focus)
+    log_focus_score(user_id, score)
+    return {"attention_score": score, "frames": frames, "dropped": dropped}
+
+@app.post("/start-focus-session")
+def start_focus(user_id: str = Form(...)):
+    _start_focus_session(user_id)
     return {"status": "started"}
 
 class FramePayload(BaseModel):
     user_id: str
     image_base64: str
 
+def _decode_frame(img_bytes):
+    # frombuffer wraps the received bytes without copying them
+    return cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+def _active_focus(user_id: str):
+    focus = user_sessions.get(user_id, {}).get("focus")
+    return focus if focus and focus["active"] else None
+
+def _count_result(focus: dict, is_attended):
+    if is_attended is True:
+        focus["frames_attended"] += 1
+    elif is_attended is False:
+        focus["frames_distracted"] += 1
+    # if None (no face), we don't increment either, but total_frames increments to lower the score.
+
+def _record_frame(user_id: str, img_bytes):
+    """Decodes one JPEG frame and adds it to the user's active focus session."""
+    focus = _active_focus(user_id)
+    if focus is None:
+        return {"status": "inactive"}
+
+    focus["total_frames"] += 1
+
+    try:
+        frame = _decode_frame(img_bytes)
+        if frame is None:
+            logger.error("Error processing frame: could not decode image")
+            return {"status": "processed"}
+
+        _count_result(focus, evaluate_frame(frame, tracker=focus.get("tracker")))
+    except Exception as e:
+        logger.error(f"Error processing frame: {e}")
+
+    return {"status": "processed"}
+
+async def _record_frame_async(user_id: str, img_bytes):
+    """
+    _record_frame for the async endpoints. While the gaze service is running
+    the frame is batched with other users' frames onto its worker processes;
+    otherwise (disabled, or stopped at shutdown) it is evaluated in-process.
+    """
+    loop = asyncio.get_running_loop()
+    if not gaze_service_running():
+        return await loop.run_in_executor(focus_executor, _record_frame, user_id, img_bytes)
+
+    focus = _active_focus(user_id)
+    if focus is None:
+        return {"status": "inactive"}
+
+    try:
+        is_attended, tracker = await asyncio.wrap_future(submit_frame(img_bytes, focus.get("tracker")))
+    except GazeServiceUnavailable:
+        # Stopped, or its worker pool broke while this frame was queued
+        return await loop.run_in_executor(focus_executor, _record_frame, user_id, img_bytes)
+    except Exception as e:
+        focus["total_frames"] += 1
+        logger.error(f"Error processing frame: {e}")
+        return {"status": "processed"}
+
+    focus["total_frames"] += 1
+    focus["tracker"] = tracker
+    _count_result(focus, is_attended)
+    return {"status": "processed"}
+
 @app.post("/process-frame")
 def process_frame(payload: FramePayload):
-    user_id = payload.user_id
-    if user_id not in user_sessions or "focus" not in user_sessions.get(user_id, {}) or not user_sessions[user_id]["focus"]["active"]:
-        return {"status": "inactive"}
-        
-    user_sessions[user_id]["focus"]["total_frames"] += 1
-    
+    # The base64 string from canvas usually comes as "data:image/jpeg;base64,/9j/4AAQ..."
+    b64_data = payload.image_base64.split(",")[1] if "," in payload.image_base64 else payload.image_base64
     try:
-        # The base64 string from canvas usually comes as "data:image/jpeg;base64,/9j/4AAQ..."
-        b64_data = payload.image_base64.split(",")[1] if "," in payload.image_base64 else payload.image_base64
         img_bytes = base64.b64decode(b64_data)
-        np_arr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        
-        is_attended = evaluate_frame(frame)
-        if is_attended is True:
-            user_sessions[user_id]["focus"]["frames_attended"] += 1
-        elif is_attended is False:
-            user_sessions[user_id]["focus"]["frames_distracted"] += 1
-        # if None (no face), we don't increment either, but total_frames increments to lower the score.
     except Exception as e:
         logger.error(f"Error processing frame: {e}")
-        
-    return {"status": "processed"}
+        img_bytes = b""
+    return _record_frame(payload.user_id, img_bytes)
+
+@app.post("/process-frame-binary")
+async def process_frame_binary(request: Request, user_id: str = None):
+    """
+    Raw JPEG ingestion: either an application/octet-stream body with
+    ?user_id=..., or multipart form data with user_id and a frame file.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        user_id = form.get("user_id", user_id)
+        upload = form.get("frame")
+        img_bytes = await upload.read() if upload is not None else b""
+    else:
+        img_bytes = await request.body()
+    if not user_id:
+        return {"status": "inactive"}
+    return await _record_frame_async(user_id, img_bytes)
+
+@app.websocket("/ws/focus/{user_id}")
+async def focus_socket(websocket: WebSocket, user_id: str):
+    """
+    Per-user focus channel. Text messages are JSON commands
+    ({"type": "start-focus-session"} / {"type": "stop-focus-session"});
+    each binary message is one JPEG frame. Only the newest unprocessed
+    frame is kept, so a slow detector drops frames instead of building
+    up latency. Every processed frame is answered with the live score.
+    """
+    await websocket.accept()
+    pending = {"frame": None}
+    frame_ready = asyncio.Event()
+    counts = {"processed": 0, "dropped": 0}
+
+    async def process_frames():
+        try:
+            while True:
+                await frame_ready.wait()
+                frame_ready.clear()
+                img_bytes, pending["frame"] = pending["frame"], None
+                if img_bytes is None:
+                    continue
+                result = await _record_frame_async(user_id, img_bytes)
+                if result["status"] != "processed":
+                    continue
+                counts["processed"] += 1
+                focus = user_sessions.get(user_id, {}).get("focus")
+                await websocket.send_json({
+                    "type": "score",
+                    "attention_score": _focus_score(focus),
+                    "processed": counts["processed"],
+                    "dropped": counts["dropped"],
+                })
+        except (WebSocketDisconnect, RuntimeError):
+            # Client went away mid-send
+            pass
+
+    processor = asyncio.create_task(process_frames())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                if pending["frame"] is not None:
+                    counts["dropped"] += 1
+                    focus = user_sessions.get(user_id, {}).get("focus")
+                    if focus:
+                        focus["frames_dropped"] = focus.get("frames_dropped", 0) + 1
+                pending["frame"] = message["bytes"]
+                frame_ready.set()
+                continue
+
+            try:
+                command = json.loads(message.get("text") or "{}").get("type")
+            except ValueError:
+                command = None
+            if command == "start-focus-session":
+                _start_focus_session(user_id)
+                counts.update(processed=0, dropped=0)
+                await websocket.send_json({"type": "started"})
+            elif command == "stop-focus-session":
+                pending["frame"] = None
+                result = await asyncio.to_thread(_stop_focus_session, user_id)
+                await websocket.send_json({"type": "stopped", **result, "processed": counts["processed"]})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        processor.cancel()
 
 @app.post("/stop-focus-session")
 def stop_focus(user_id: str = Form(...)):
-    score = 0.0
-    frames = 0
-    if user_id in user_sessions and "focus" in user_sessions[user_id]:
-        focus_data = user_sessions[user_id]["focus"]
-        focus_data["active"] = False
-        frames = focus_data["total_frames"]
-        attended = focus_data["frames_attended"]
-        if frames > 0:
-            score = (attended / frames) * 100
-            
-    score = round(score, 2)
-    log_focus_score(user_id, score)
-    return {"attention_score": score, "frames": frames}
+    return _stop_focus_session(user_id)
 
 class ImpatiencePayload(BaseModel):
     user_id: str
@@ -347,8 +553,8 @@ class QuizRequest(BaseModel):
 from response_handler import generate_quiz
 
 @app.post("/generate-quiz")
-def generate_quiz_api(payload: QuizRequest):
-    quiz = generate_quiz(payload.context, payload.topic)
+async def generate_quiz_api(payload: QuizRequest):
+    quiz = await generate_quiz(payload.context, payload.topic)
     return {"quiz": quiz}
 
 class QuizSubmission(BaseModel):
@@ -362,7 +568,7 @@ class QuizSubmission(BaseModel):
 from graph_logger import log_concept_mastery
 
 @app.post("/submit-quiz")
-def submit_quiz(payload: QuizSubmission):
+async def submit_quiz(payload: QuizSubmission):
     score = 0
     total = len(payload.answers)
     wrong_concepts = []
@@ -385,10 +591,15 @@ def submit_quiz(payload: QuizSubmission):
             })
 
     percentage = score / total if total > 0 else 0
-    log_concept_mastery(user_id=payload.user_id, concept=payload.topic, score=percentage)
-    
     feedback = "Good job! You're understanding the concept well." if percentage >= 0.6 else "You might need a simpler explanation. Let's revisit the concept."
-    explanation_text = explain_mistakes(wrong_concepts) if wrong_concepts else ""
+
+    # The mastery write and the LLM explanation are independent, run them together
+    mastery_task = asyncio.to_thread(log_concept_mastery, user_id=payload.user_id, concept=payload.topic, score=percentage)
+    if wrong_concepts:
+        _, explanation_text = await asyncio.gather(mastery_task, explain_mistakes(wrong_concepts))
+    else:
+        await mastery_task
+        explanation_text = ""
     return {"score": percentage, "feedback": feedback, "details": feedback_details, "explanation": explanation_text}
 
 class ExplainPayload(BaseModel):
@@ -398,9 +609,9 @@ class ExplainPayload(BaseModel):
     user_explanation: str
 
 @app.post("/evaluate-understanding")
-def evaluate_understanding(payload: ExplainPayload):
+async def evaluate_understanding(payload: ExplainPayload):
     prompt = f"Concept: {payload.concept}\nOriginal Explanation: {payload.original_explanation}\nStudent Explanation: {payload.user_explanation}\nEvaluate the student..."
-    return {"evaluation": ask_question(prompt, payload.user_explanation)}
+    return {"evaluation": await ask_question(prompt, payload.user_explanation)}
 
 @app.get("/focus-trend/{user_id}")
 def get_focus_trend(user_id: str):
@@ -425,47 +636,39 @@ def get_user_insights(user_id: str):
 def concept_mastery(user_id: str):
     return {"mastery": get_concept_mastery(user_id)}
 
-def generate_video_task(job_id: str, script: str, user_id: str, intent: str, modality: str):
-    try:
-        output_filename = f"{job_id}.mp4"
-        video_path = create_video_from_script(script, output_filename)
-        if video_path and os.path.exists(video_path):
-            video_url = f"/videos/{output_filename}"
-            video_jobs[job_id] = {"status": "completed", "video_url": video_url, "script": script}
-            log_interaction(user_id=user_id, content_id="video_generation", event_type=intent, modality=modality)
-        else:
-            video_jobs[job_id] = {"status": "failed", "error": "Video path does not exist", "script": script}
-    except Exception as e:
-        logger.error(f"Error in video task: {e}")
-        video_jobs[job_id] = {"status": "failed", "error": str(e), "script": script}
-
 @app.get("/video-status/{job_id}")
 def get_video_status(job_id: str):
-    return video_jobs.get(job_id, {"status": "not_found"})
+    return get_job(job_id) or {"status": "not_found"}
+
+@app.post("/video-cancel/{job_id}")
+def cancel_video(job_id: str):
+    return {"cancelled": cancel_job(job_id)}
 
 @app.post("/generate-audio")
-def generate_audio(text: str = Form(...)):
+def generate_audio(text: str = Form(...), voice: str = Form(None), speed: float = Form(1.0)):
     try:
-        audio_id = str(uuid.uuid4())
-        audio_path = f"generated_videos/{audio_id}.mp3"
-        tts = gTTS(text=text, lang='en', slow=False)
-        tts.save(audio_path)
-        return {"audio_url": f"/videos/{audio_id}.mp3"}
-    except Exception as e:
+        audio_path = synthesize(text, voice, speed)
+    except ValueError as e:
         return {"error": str(e)}
+    if not audio_path:
+        return {"error": "Audio generation failed"}
+    return {"audio_url": audio_url(audio_path)}
 
-@app.post("/process-message")
-async def process_message(background_tasks: BackgroundTasks, request: Request):
+async def read_message_payload(request: Request):
     content_type = request.headers.get("content-type", "")
     try:
         if "application/json" in content_type:
-            data = await request.json()
-        else:
-            form_data = await request.form()
-            data = dict(form_data)
+            return await request.json()
+        form_data = await request.form()
+        return dict(form_data)
     except Exception:
-        data = {}
+        return {}
 
+async def plan_message(data: dict):
+    """
+    Resolves intent, teaching strategy and the final prompt for a chat
+    message. Shared by the blocking and the streaming endpoints.
+    """
     message = data.get("message", "")
     pdfContent = data.get("pdfContent", "")
     user_id = data.get("user_id") or "user_fallback"
@@ -474,82 +677,171 @@ async def process_message(background_tasks: BackgroundTasks, request: Request):
         feedbackGranularity = int(data.get("feedbackGranularity", 5) or 5)
     except Exception:
         feedbackGranularity = 5
-
-    anxiety_level = 0
     try:
-        intent = classify_intent(message)
-        session = user_sessions.get(user_id, {})
-        pdf_chunks = session.get("pdf_chunks", [])
-        pdf_text = session.get("pdf_text", "") or pdfContent
-
-        pdf_context = "No PDF content."
-        if pdf_chunks and len(pdf_chunks) > 0:
-            pdf_context = find_relevant_chunks(message, pdf_chunks, top_k=5)
-        elif pdf_text:
-            pdf_context = pdf_text[:2000]
-
-        context = get_context() + "\n\n" + pdf_context
-
-        if intent == "summarize":
-            summary = summarize_text(pdf_text)
-            response = summary if summary.strip() else "Could not summarize."
-            effective_modality = modality
-            strategy = {"reason": "Summary requested", "framework": "Default"}
-            concept = "summary"
-        else:
-            user_disabilities = get_user_disabilities(user_id)
-            observed_modality = infer_preferred_modality(user_id)
-            strategy = resolve_teaching_strategy(user_disabilities, modality, observed_modality)
-            effective_modality = strategy["effective_modality"]
-
-            modality_instruction = build_modality_instruction(effective_modality)
-            disability_instruction = build_disability_instruction(user_disabilities)
-            anxiety_structure = build_anxiety_structure(anxiety_level)
-            emotional_instruction = build_emotional_instruction(anxiety_level, "Depression" in user_disabilities)
-
-            prompt = f"{modality_instruction}\n{disability_instruction}\n{emotional_instruction}\n\nIMPORTANT:\n- Explain at most {anxiety_structure['max_concepts']} main ideas.\n- Use {anxiety_structure['sentence_style']} sentences.\n- Examples are {anxiety_structure['examples']}.\n"
-            if feedbackGranularity < 5:
-                prompt += "- Provide concise, brief summaries. Avoid overly detailed breakdowns.\n"
-            else:
-                prompt += "- Provide detailed, step-by-step breakdowns of the concepts.\n"
-            prompt += f"Context:\n{context}\n\nQuestion:\n{message}"
-            # response = ask_question(prompt, message)
-            if effective_modality == "diagram":
-                diagram_prompt = f"""
-                {modality_instruction}
+        video_priority = int(data.get("videoPriority", 0) or 0)
+    except Exception:
+        video_priority = 0
 
-                Question:
-                {message}
+    anxiety_level = 0
+    intent = classify_intent(message)
+    session = user_sessions.get(user_id, {})
+    pdf_chunks = session.get("pdf_chunks", [])
+    pdf_text = session.get("pdf_text", "") or pdfContent
+
+    plan = {
+        "message": message,
+        "user_id": user_id,
+        "modality": modality,
+        "feedback_granularity": feedbackGranularity,
+        "video_priority": video_priority,
+        "intent": intent,
+        "pdf_text": pdf_text,
+    }
 
-                Context:
-                {context[:2000]}
-                """
+    if intent == "summarize":
+        plan.update({
+            "effective_modality": modality,
+            "strategy": {"reason": "Summary requested", "framework": "Default"},
+        })
+        return plan
 
-                response = ask_question(diagram_prompt, message)
+    pdf_context = "No PDF content."
+    if pdf_chunks and len(pdf_chunks) > 0:
+        pdf_context = find_relevant_chunks(message, pdf_chunks, top_k=5, index=session.get("pdf_index"))
+    elif pdf_text:
+        pdf_context = pdf_text[:2000]
 
-            else:
-                response = ask_question(prompt, message)
-            concept = extract_concept(response)
+    context = get_context() + "\n\n" + pdf_context
 
-        if effective_modality == "video":
-            job_id = str(uuid.uuid4())
-            video_jobs[job_id] = {"status": "processing"}
-            background_tasks.add_task(generate_video_task, job_id, response, user_id, intent, modality)
-            return {
-                "type": "video_job",
-                "job_id": job_id,
-                "script": response,
-                "effective_modality": effective_modality,
-                "strategy_explanation": {"reason": strategy["reason"], "framework": strategy["framework"]}
-            }
-
-        update_context(message, response)
-        log_interaction(user_id=user_id, content_id="chat_general", event_type=intent, modality=modality, feedback_granularity=feedbackGranularity)
+    user_disabilities, observed_modality = await asyncio.gather(
+        asyncio.to_thread(get_user_disabilities, user_id),
+        asyncio.to_thread(infer_preferred_modality, user_id)
+    )
+    strategy = resolve_teaching_strategy(user_disabilities, modality, observed_modality)
+    effective_modality = strategy["effective_modality"]
+
+    modality_instruction = build_modality_instruction(effective_modality)
+    disability_instruction = build_disability_instruction(user_disabilities)
+    anxiety_structure = build_anxiety_structure(anxiety_level)
+    emotional_instruction = build_emotional_instruction(anxiety_level, "Depression" in user_disabilities)
+
+    if effective_modality == "diagram":
+        prompt = f"""
+        {modality_instruction}
+
+        Question:
+        {message}
+
+        Context:
+        {context[:2000]}
+        """
+    else:
+        prompt = f"{modality_instruction}\n{disability_instruction}\n{emotional_instruction}\n\nIMPORTANT:\n- Explain at most {anxiety_structure['max_concepts']} main ideas.\n- Use {anxiety_structure['sentence_style']} sentences.\n- Examples are {anxiety_structure['examples']}.\n"
+        if feedbackGranularity < 5:
+            prompt += "- Provide concise, brief summaries. Avoid overly detailed breakdowns.\n"
+        else:
+            prompt += "- Provide detailed, step-by-step breakdowns of the concepts.\n"
+        prompt += f"Context:\n{context}\n\nQuestion:\n{message}"
+
+    plan.update({
+        "effective_modality": effective_modality,
+        "strategy": strategy,
+        "prompt": prompt,
+        # Rephrased questions on the same document share answers only
+        # when the learner-specific instructions are identical too. Chats
+        # without an uploaded PDF are scoped to the user, since their
+        # context comes from the client and isn't shared
+        "cache_scope": make_scope(
+            session.get("doc_id") or f"user:{user_id}", effective_modality, disability_instruction,
+            emotional_instruction, feedbackGranularity < 5
+        ),
+    })
+    return plan
+
+async def summarize_for_plan(plan: dict):
+    doc_id = user_sessions.get(plan["user_id"], {}).get("doc_id")
+    if doc_id:
+        summary = await get_document_summary(doc_id)
+    else:
+        summary = await summarize_text(plan["pdf_text"])
+    return summary if summary.strip() else "Could not summarize."
+
+async def finish_message(plan: dict, response: str, concept: str):
+    strategy = plan["strategy"]
+    strategy_explanation = {"reason": strategy["reason"], "framework": strategy["framework"]}
+
+    if plan["effective_modality"] == "video":
+        job_id = await asyncio.to_thread(
+            enqueue_job, response, plan["user_id"], plan["intent"], plan["modality"], plan["video_priority"]
+        )
         return {
-            "response": response,
-            "effective_modality": effective_modality,
-            "concept": concept,
-            "strategy_explanation": {"reason": strategy["reason"], "framework": strategy["framework"]}
+            "type": "video_job",
+            "job_id": job_id,
+            "script": response,
+            "effective_modality": plan["effective_modality"],
+            "strategy_explanation": strategy_explanation
         }
+
+    await update_context(plan["message"], response)
+    log_interaction(user_id=plan["user_id"], content_id="chat_general", event_type=plan["intent"], modality=plan["modality"], feedback_granularity=plan["feedback_granularity"])
+    return {
+        "response": response,
+        "effective_modality": plan["effective_modality"],
+        "concept": concept,
+        "strategy_explanation": strategy_explanation
+    }
+
+@app.post("/process-message")
+async def process_message(request: Request):
+    data = await read_message_payload(request)
+    try:
+        plan = await plan_message(data)
+        if plan["intent"] == "summarize":
+            response = await summarize_for_plan(plan)
+            concept = "summary"
+        else:
+            response = await ask_question(plan["prompt"], plan["message"], cache_scope=plan["cache_scope"])
+            concept = extract_concept(response)
+        return await finish_message(plan, response, concept)
     except Exception as e:
-        return {"response": f"Error: {str(e)}"}
\ No newline at end of file
+        return {"response": f"Error: {str(e)}"}
+
+def _sse(payload: dict):
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.post("/process-message-stream")
+async def process_message_stream(request: Request):
+    """
+    Server-sent events variant of /process-message. Emits one
+    {"type": "start"} event with the effective modality, {"type": "token"}
+    events as the answer is generated, then {"type": "done", "result": ...}
+    where result is what /process-message returns.
+    """
+    data = await read_message_payload(request)
+
+    async def event_stream():
+        try:
+            plan = await plan_message(data)
+            yield _sse({"type": "start", "effective_modality": plan["effective_modality"]})
+            if plan["intent"] == "summarize":
+                response = await summarize_for_plan(plan)
+                yield _sse({"type": "token", "content": response})
+                concept = "summary"
+            else:
+                parts = []
+                async for token in ask_question_stream(plan["prompt"], plan["message"], cache_scope=plan["cache_scope"]):
+                    parts.append(token)
+                    yield _sse({"type": "token", "content": token})
+                response = "".join(parts).strip()
+                concept = extract_concept(response)
+            result = await finish_message(plan, response, concept)
+            # Nested, since result can carry its own "type" (video_job)
+            yield _sse({"type": "done", "result": result})
+        except Exception as e:
+            yield _sse({"type": "error", "response": f"Error: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
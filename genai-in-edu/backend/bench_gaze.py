@@ -0,0 +1,67 @@
+import os
+import time
+
+import numpy as np
+
+import focus_tracker
+
+RUNS = int(os.getenv("BENCH_RUNS", "500"))
+
+# Eye contours (landmarks 36-47) of a face roughly centred in a 640x480 frame
+EYE_POINTS = np.array([
+    (250, 200), (262, 192), (276, 192), (288, 201), (276, 206), (262, 206),
+    (352, 201), (364, 192), (378, 192), (390, 200), (378, 206), (364, 206),
+], np.int32)
+
+
+class FakePoint:
+    def __init__(self, x, y):
+        self.x, self.y = int(x), int(y)
+
+
+class FakeLandmarks:
+    """Stands in for dlib's full_object_detection."""
+
+    def __init__(self, points):
+        self._points = [FakePoint(x, y) for x, y in points]
+
+    def part(self, i):
+        return self._points[i]
+
+    def parts(self):
+        return self._points
+
+
+def make_case(width, height):
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    points = np.zeros((68, 2), np.int32)
+    points[36:48] = EYE_POINTS * np.array([width / 640, height / 480])
+    return gray, points
+
+
+def legacy(points, gray):
+    return (
+        focus_tracker._gaze_ratio_full_frame(points[36:42], gray),
+        focus_tracker._gaze_ratio_full_frame(points[42:48], gray),
+    )
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        fn(*args)
+    return (time.perf_counter() - start) / RUNS * 1e6
+
+
+if __name__ == "__main__":
+    for width, height in [(640, 480), (1280, 720)]:
+        gray, points = make_case(width, height)
+        assert legacy(points, gray) == focus_tracker.gaze_ratios(points, gray)
+        landmarks = FakeLandmarks(points)
+
+        before = timed(legacy, points, gray)
+        after = timed(focus_tracker.gaze_ratios, points, gray)
+        with_conversion = timed(lambda: focus_tracker.gaze_ratios(focus_tracker.landmarks_to_array(landmarks), gray))
+        print(f"{width}x{height}: full-frame masks {before:7.1f} us   eye patches {after:7.1f} us"
+              f"   (+landmark conversion {with_conversion:7.1f} us)   {before / after:4.1f}x")
@@ -0,0 +1,96 @@
+import os
+import time
+import tempfile
+import textwrap
+import tracemalloc
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageFilter
+
+import video_generator
+
+RUNS = int(os.getenv("BENCH_RUNS", "10"))
+# Largest per-channel difference allowed between legacy and cached backgrounds
+TOLERANCE = 1
+
+TITLE = "Cloud Service Models"
+CONTENT = (
+    "IaaS rents out raw compute, storage and networking.\n"
+    "PaaS adds a managed runtime so teams only deploy code.\n"
+    "SaaS delivers finished applications over the browser."
+)
+
+
+def legacy_background(bg_image_path):
+    try:
+        img = Image.open(bg_image_path)
+        img = img.resize((1920, 1080), Image.Resampling.LANCZOS)
+    except Exception:
+        img = Image.new('RGB', (1920, 1080), (30, 30, 50))
+    img = img.filter(ImageFilter.GaussianBlur(radius=2))
+    img = img.convert('RGBA')
+    overlay = Image.new('RGBA', img.size, (0, 0, 0, 160))
+    img = Image.alpha_composite(img, overlay)
+    return img.convert('RGB')
+
+
+def legacy_slide(bg_image_path, title, content, index, asset_dir):
+    """The slide renderer before font and background caching, for comparison."""
+    img = legacy_background(bg_image_path)
+    draw = ImageDraw.Draw(img)
+    try:
+        title_font = ImageFont.truetype("C:/Windows/Fonts/arialbd.ttf", 90)
+        content_font = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 45)
+    except OSError:
+        try:
+            title_font = ImageFont.truetype("arial.ttf", 90)
+            content_font = ImageFont.truetype("arial.ttf", 45)
+        except OSError:
+            title_font = ImageFont.load_default()
+            content_font = ImageFont.load_default()
+    title_wrapped = textwrap.fill(title, width=30)
+    draw.text((105, 205), title_wrapped, fill=(0, 0, 0), font=title_font)
+    draw.text((100, 200), title_wrapped, fill=(255, 255, 255), font=title_font)
+    content_wrapped = '\n'.join(textwrap.fill(l.strip(), width=55) for l in content.split('\n') if l.strip())
+    draw.text((105, 403), content_wrapped, fill=(0, 0, 0), font=content_font)
+    draw.text((100, 400), content_wrapped, fill=(220, 220, 220), font=content_font)
+    slide_path = os.path.join(asset_dir, f"slide_{index}.jpg")
+    img.save(slide_path, quality=95)
+    return slide_path
+
+
+def check_background(bg_path):
+    """The one-pass darkening must stay within TOLERANCE of the legacy composite."""
+    diff = ImageChops.difference(legacy_background(bg_path), video_generator.slide_background(bg_path))
+    worst = max(high for _, high in diff.getextrema())
+    assert worst <= TOLERANCE, f"background differs from legacy by up to {worst} per channel"
+    print(f"background matches legacy within {worst} per channel\n")
+
+
+def measure(label, render, clear_caches=False):
+    times = []
+    peak = 0
+    for i in range(RUNS):
+        if clear_caches:
+            video_generator._slide_background.cache_clear()
+            video_generator.load_slide_fonts.cache_clear()
+        tracemalloc.start()
+        start = time.perf_counter()
+        render(i)
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(f"{label:<28} {sum(times) / len(times) * 1000:8.1f} ms/slide   peak {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    bg_path = video_generator.create_gradient_background(0)
+    check_background(bg_path)
+    with tempfile.TemporaryDirectory() as out_dir:
+        print(f"{RUNS} slides per case, 1920x1080\n")
+        measure("before (legacy)", lambda i: legacy_slide(bg_path, TITLE, CONTENT, i, out_dir))
+        measure("after, cold caches, file", lambda i: video_generator.create_slide_with_text(
+            bg_path, TITLE, CONTENT, i, out_dir), clear_caches=True)
+        measure("after, warm caches, file", lambda i: video_generator.create_slide_with_text(
+            bg_path, TITLE, CONTENT, i, out_dir))
+        measure("after, warm caches, memory", lambda i: video_generator.create_slide_with_text(
+            bg_path, TITLE, CONTENT, i, out_dir, as_array=True))
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import cv2
+
+import focus_tracker
+
+# Share of frames where tracked and full-frame detection must agree
+MIN_AGREEMENT = float(os.getenv("CHECK_MIN_AGREEMENT", "0.95"))
+# Largest corner offset (px) between the two face boxes still counted as the same face
+MAX_BOX_OFFSET = int(os.getenv("CHECK_MAX_BOX_OFFSET", "12"))
+
+
+def read_frames(path):
+    capture = cv2.VideoCapture(path)
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield frame
+    capture.release()
+
+
+def full_box(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return focus_tracker._detect_full(gray)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python check_tracking.py <webcam recording, e.g. fixture.mp4>")
+
+    tracker = focus_tracker.new_tracker()
+    frames = agree = box_drift = 0
+    for frame in read_frames(sys.argv[1]):
+        frames += 1
+        expected = focus_tracker.evaluate_frame(frame)
+        tracked = focus_tracker.evaluate_frame(frame, tracker=tracker)
+        if expected == tracked:
+            agree += 1
+        else:
+            print(f"frame {frames - 1}: full {expected}  tracked {tracked}")
+
+        box = full_box(frame)
+        if box is not None and tracker["box"] is not None:
+            offset = max(abs(a - b) for a, b in zip(box, tracker["box"]))
+            if offset > MAX_BOX_OFFSET:
+                box_drift += 1
+                print(f"frame {frames - 1}: tracked box {tracker['box']} is {offset}px from {box}")
+
+    if not frames:
+        sys.exit(f"no frames read from {sys.argv[1]}")
+    agreement = agree / frames
+    print(f"{frames} frames: results agree on {agreement:.1%}, {box_drift} boxes off by more than {MAX_BOX_OFFSET}px")
+    sys.exit(0 if agreement >= MIN_AGREEMENT and box_drift / frames <= 1 - MIN_AGREEMENT else 1)
@@ -1,12 +1,6 @@
-import os
-from groq import Groq
-from dotenv import load_dotenv
-load_dotenv()
+from response_handler import GROQ_MODEL, client, _call_groq_with_fallback
 
-# Initialize Groq client
-GROQ_API = os.getenv("GROQ_API_KEY")
-groq_client = Groq(api_key=GROQ_API) if GROQ_API else None
-GROQ_MODEL = os.getenv("GROQ_MODEL", "groq/compound")
+SUMMARY_MODELS = [GROQ_MODEL, "groq/compound-mini", "qwen/qwen3.6-27b"]
 
 # In-memory session-level context
 conversation_context = {
@@ -14,38 +8,33 @@ conversation_context = {
     "topics": [],
 }
 
-def update_context(user_message, bot_response):
+async def update_context(user_message, bot_response):
     global conversation_context
 
     combined_text = (conversation_context["summary"] + " " + bot_response).strip()
     
-    if len(combined_text.split()) > 80 and groq_client:
+    if len(combined_text.split()) > 80 and client:
         try:
-            for model in [GROQ_MODEL, "groq/compound-mini", "qwen/qwen3.6-27b"]:
-                try:
-                    res = groq_client.chat.completions.create(
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": "You are a concise conversation summarizer. Summarize the conversation in 1-2 short sentences and list 3 key topics (comma-separated) on a new line starting with 'Topics:'."
-                            },
-                            {"role": "user", "content": combined_text[:1000]}
-                        ],
-                        model=model,
-                        max_tokens=100
-                    )
-                    content = res.choices[0].message.content.strip()
-                    if "</think>" in content:
-                        content = content.split("</think>")[-1].strip()
-                    lines = content.split("\n")
-                    conversation_context["summary"] = lines[0]
-                    for line in lines[1:]:
-                        if "topics:" in line.lower():
-                            topics = [t.strip() for t in line.split(":", 1)[1].split(",") if t.strip()]
-                            conversation_context["topics"] = list(set(conversation_context["topics"] + topics))
-                    break
-                except Exception:
-                    continue
+            content = await _call_groq_with_fallback(
+                [
+                    {
+                        "role": "system", 
+                        "content": "You are a concise conversation summarizer. Summarize the conversation in 1-2 short sentences and list 3 key topics (comma-separated) on a new line starting with 'Topics:'."
+                    },
+                    {"role": "user", "content": combined_text[:1000]}
+                ],
+                max_tokens=100,
+                models=SUMMARY_MODELS
+            )
+            # Every model failed, keep the previous summary
+            if content.startswith("Error:"):
+                return conversation_context
+            lines = content.split("\n")
+            conversation_context["summary"] = lines[0]
+            for line in lines[1:]:
+                if "topics:" in line.lower():
+                    topics = [t.strip() for t in line.split(":", 1)[1].split(",") if t.strip()]
+                    conversation_context["topics"] = list(set(conversation_context["topics"] + topics))
         except Exception:
             conversation_context["summary"] = combined_text[:300]
     else:
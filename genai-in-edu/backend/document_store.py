@@ -0,0 +1,152 @@
+# document_store.py
+import os
+import asyncio
+import hashlib
+import pickle
+import threading
+import logging
+from collections import OrderedDict
+
+from response_handler import extract_text_from_pdf, summarize_document
+from retrieval import chunk_pages, build_chunk_index
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "document_store")
+# Parsed documents kept in memory; older ones are reloaded from disk on demand
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "32"))
+os.makedirs(DOCUMENT_STORE_DIR, exist_ok=True)
+
+# doc_id -> {"doc_id", "text", "chunks", "index", "chunk_summaries", "summary"},
+# least recently used first
+_documents = OrderedDict()
+_lock = threading.Lock()
+_build_locks = {}
+# doc_id -> running summarisation task, so concurrent requests share one run
+_summary_tasks = {}
+
+def document_id(file_bytes: bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def _document_path(doc_id: str):
+    return os.path.join(DOCUMENT_STORE_DIR, f"{doc_id}.pkl")
+
+def _load_document(doc_id: str):
+    path = _document_path(doc_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        logger.error(f"Error loading cached document {doc_id}: {e}")
+        return None
+
+def _save_document(doc: dict):
+    path = _document_path(doc["doc_id"])
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(doc, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Error persisting document {doc['doc_id']}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _remember(doc: dict):
+    """Adds doc to the in-memory LRU (caller holds _lock) and returns the cached copy."""
+    doc = _documents.setdefault(doc["doc_id"], doc)
+    _documents.move_to_end(doc["doc_id"])
+    while len(_documents) > DOCUMENT_CACHE_SIZE:
+        _documents.popitem(last=False)
+    return doc
+
+def get_document(doc_id: str):
+    """Returns a cached document from memory or disk, or None."""
+    with _lock:
+        doc = _documents.get(doc_id)
+        if doc is not None:
+            _documents.move_to_end(doc_id)
+            return doc
+    doc = _load_document(doc_id)
+    if doc is not None:
+        with _lock:
+            doc = _remember(doc)
+    return doc
+
+def get_or_create_document(file_bytes: bytes):
+    """
+    Returns the parsed document for these PDF bytes, running extraction,
+    chunking and indexing only the first time a given file is seen.
+    """
+    doc_id = document_id(file_bytes)
+    doc = get_document(doc_id)
+    if doc is not None:
+        logger.info(f"Document cache hit for {doc_id[:12]}")
+        return doc
+
+    with _lock:
+        build_lock = _build_locks.setdefault(doc_id, threading.Lock())
+
+    with build_lock:
+        try:
+            # Another upload of the same file may have finished while we waited
+            doc = get_document(doc_id)
+            if doc is not None:
+                return doc
+
+            # Chunk pages as they come off the extractor instead of waiting
+            # for the whole document
+            pages = []
+            def _collect_pages():
+                for page in extract_text_from_pdf(file_bytes, stream=True):
+                    pages.append(page)
+                    yield page
+            chunks = list(chunk_pages(_collect_pages()))
+            text = "".join(pages)
+            doc = {
+                "doc_id": doc_id,
+                "text": text,
+                "chunks": chunks,
+                "index": build_chunk_index(chunks),
+            }
+            _save_document(doc)
+            with _lock:
+                doc = _remember(doc)
+        finally:
+            # Also on failure, so a PDF that can't be parsed doesn't leave
+            # its lock behind for good
+            with _lock:
+                _build_locks.pop(doc_id, None)
+
+    logger.info(f"Indexed new document {doc_id[:12]} ({len(chunks)} chunks)")
+    return doc
+
+async def _build_summary(doc: dict):
+    summary, chunk_summaries, complete = await summarize_document(doc["chunks"], doc.get("chunk_summaries"))
+    doc["chunk_summaries"] = chunk_summaries
+    # Only a summary built from every chunk is final. A partial one is still
+    # returned for this request, and the chunk summaries are kept so a retry
+    # only summarises the chunks that failed
+    if complete:
+        doc["summary"] = summary
+    elif summary and not summary.startswith("Error:"):
+        logger.warning(f"Summary for {doc['doc_id'][:12]} is missing chunks, will retry on next request")
+    await asyncio.to_thread(_save_document, doc)
+    return summary
+
+async def get_document_summary(doc_id: str):
+    """Returns the cached whole-document summary, computing it at most once."""
+    doc = get_document(doc_id)
+    if doc is None:
+        return ""
+    if doc.get("summary"):
+        return doc["summary"]
+
+    task = _summary_tasks.get(doc_id)
+    if task is None:
+        task = asyncio.ensure_future(_build_summary(doc))
+        _summary_tasks[doc_id] = task
+        task.add_done_callback(lambda _: _summary_tasks.pop(doc_id, None))
+    return await asyncio.shield(task)
@@ -3,6 +3,16 @@ import dlib
 import numpy as np
 import os
 
+# Tracking mode: detect on a frame scaled by FOCUS_DETECT_SCALE, then only
+# search a window padded by FOCUS_ROI_PADDING (fraction of the face box)
+FOCUS_DETECT_SCALE = float(os.getenv("FOCUS_DETECT_SCALE", "0.5"))
+FOCUS_ROI_PADDING = float(os.getenv("FOCUS_ROI_PADDING", "0.5"))
+FOCUS_REDETECT_INTERVAL = int(os.getenv("FOCUS_REDETECT_INTERVAL", "10"))
+# Frames are never detected on at less than this width, since dlib misses
+# faces under ~80px. The web client sends 320x240, so for it only the ROI
+# search saves work; downscaling applies to larger (e.g. 640x480) frames
+FOCUS_MIN_DETECT_WIDTH = int(os.getenv("FOCUS_MIN_DETECT_WIDTH", "320"))
+
 _detector = None
 _predictor = None
 
@@ -24,9 +34,34 @@ def get_predictor():
         _predictor = dlib.shape_predictor(model_path)
     return _predictor
 
-def get_gaze_ratio(eye_points, landmarks, gray):
-    region = np.array([(landmarks.part(p).x, landmarks.part(p).y) for p in eye_points], np.int32)
+LEFT_EYE = [36, 37, 38, 39, 40, 41]
+RIGHT_EYE = [42, 43, 44, 45, 46, 47]
+
+def landmarks_to_array(landmarks):
+    """dlib full_object_detection -> (68, 2) int32 array of (x, y)."""
+    return np.array([(p.x, p.y) for p in landmarks.parts()], np.int32)
+
+def _threshold_ratio(gray_eye):
+    _, thresh = cv2.threshold(gray_eye, 70, 255, cv2.THRESH_BINARY)
 
+    if thresh is None:
+        return 1
+
+    h, w = thresh.shape
+    left = thresh[:, :w//2]
+    right = thresh[:, w//2:]
+
+    left_white = cv2.countNonZero(left)
+    right_white = cv2.countNonZero(right)
+
+    if right_white == 0:
+        return 1
+
+    return left_white / right_white
+
+def _gaze_ratio_full_frame(region, gray):
+    # Original full-frame mask version; still used when the eye runs off the
+    # top or left edge, where the crop below would slice differently
     mask = np.zeros(gray.shape, np.uint8)
     cv2.fillPoly(mask, [region], 255)
 
@@ -44,44 +79,127 @@ def get_gaze_ratio(eye_points, landmarks, gray):
     if gray_eye.size == 0:
         return 1
 
-    _, thresh = cv2.threshold(gray_eye, 70, 255, cv2.THRESH_BINARY)
+    return _threshold_ratio(gray_eye)
 
-    if thresh is None:
+def _gaze_ratio_patch(region, origin, gray):
+    """Gaze ratio from the eye's bounding box only, masked in patch coordinates."""
+    min_x, min_y = origin
+    patch = gray[min_y:region[:, 1].max(), min_x:region[:, 0].max()]
+    if patch.size == 0:
         return 1
+    mask = np.zeros(patch.shape, np.uint8)
+    cv2.fillPoly(mask, [region - origin], 255)
+    return _threshold_ratio(cv2.bitwise_and(patch, patch, mask=mask))
 
-    h, w = thresh.shape
-    left = thresh[:, :w//2]
-    right = thresh[:, w//2:]
+def _eye_gaze_ratio(region, origin, extent, gray):
+    # Handle edge case where eye region is flat
+    if extent[0] == 0 or extent[1] == 0:
+        return 1
+    if origin[0] < 0 or origin[1] < 0:
+        return _gaze_ratio_full_frame(region, gray)
+    return _gaze_ratio_patch(region, origin, gray)
+
+def gaze_ratios(points, gray):
+    """Gaze ratios of both eyes from a (68, 2) landmark array."""
+    eyes = points[LEFT_EYE[0]:RIGHT_EYE[-1] + 1].reshape(2, 6, 2)
+    # Bounding boxes of both eyes in one pass
+    origins = eyes.min(axis=1)
+    extents = eyes.max(axis=1) - origins
+    return tuple(_eye_gaze_ratio(eyes[i], origins[i], extents[i], gray) for i in range(2))
 
-    left_white = cv2.countNonZero(left)
-    right_white = cv2.countNonZero(right)
+def get_gaze_ratio(eye_points, landmarks, gray):
+    region = np.array([(landmarks.part(p).x, landmarks.part(p).y) for p in eye_points], np.int32)
+    origin = region.min(axis=0)
+    return _eye_gaze_ratio(region, origin, region.max(axis=0) - origin, gray)
 
-    if right_white == 0:
-        return 1
+def new_tracker():
+    """
+    Face tracking state for evaluate_frame. Plain data so it can be kept
+    per focus session or sent to another process with the frame.
+    """
+    return {"box": None, "frames_since_detect": 0}
+
+def _first_face(faces):
+    # Same pick as the untracked path, so both follow the same person
+    return faces[0] if len(faces) else None
+
+def _search_roi(gray, box):
+    """Looks for the face only in a padded window around its last position."""
+    left, top, right, bottom = box
+    pad_x = int((right - left) * FOCUS_ROI_PADDING)
+    pad_y = int((bottom - top) * FOCUS_ROI_PADDING)
+    x0, y0 = max(0, left - pad_x), max(0, top - pad_y)
+    x1, y1 = min(gray.shape[1], right + pad_x), min(gray.shape[0], bottom + pad_y)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    face = _first_face(get_detector()(gray[y0:y1, x0:x1]))
+    if face is None:
+        return None
+    return (face.left() + x0, face.top() + y0, face.right() + x0, face.bottom() + y0)
+
+def _detect_downscaled(gray):
+    # Small webcam frames are left alone (see FOCUS_MIN_DETECT_WIDTH)
+    scale = max(FOCUS_DETECT_SCALE, FOCUS_MIN_DETECT_WIDTH / gray.shape[1])
+    if scale >= 1.0:
+        return None
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    face = _first_face(get_detector()(small))
+    if face is None:
+        return None
+    return tuple(int(round(v / scale)) for v in (face.left(), face.top(), face.right(), face.bottom()))
+
+def _detect_full(gray):
+    face = _first_face(get_detector()(gray))
+    if face is None:
+        return None
+    return (face.left(), face.top(), face.right(), face.bottom())
+
+def _track_face(gray, tracker):
+    box = None
+    if tracker["box"] is not None and tracker["frames_since_detect"] < FOCUS_REDETECT_INTERVAL:
+        box = _search_roi(gray, tracker["box"])
+        if box is not None:
+            tracker["frames_since_detect"] += 1
+
+    if box is None:
+        # A miss at low resolution falls back to the original full-frame
+        # detection, so "no face" means the same thing as before
+        box = _detect_downscaled(gray) or _detect_full(gray)
+        tracker["frames_since_detect"] = 0
+
+    tracker["box"] = box
+    return box
+
+def _is_attended(gray, face):
+    predictor = get_predictor()
+    landmarks = predictor(gray, face)
 
-    return left_white / right_white
+    g1, g2 = gaze_ratios(landmarks_to_array(landmarks), gray)
 
-def evaluate_frame(frame):
+    gaze = (g1 + g2) / 2
+
+    return 0.5 <= gaze <= 2.0
+
+def evaluate_frame(frame, tracker=None):
     """
     Evaluates a single OpenCV BGR frame for attention based on gaze ratio.
     Returns: True if attended, False if distracted, None if no face detected.
+    With a tracker (see new_tracker) the face is found on a downscaled frame
+    and then followed within a window around its last box, with a full
+    re-detection every FOCUS_REDETECT_INTERVAL frames or after a miss.
     """
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    if tracker is not None:
+        box = _track_face(gray, tracker)
+        if box is None:
+            return None
+        return _is_attended(gray, dlib.rectangle(*box))
+
     detector = get_detector()
-    predictor = get_predictor()
     faces = detector(gray)
 
     for face in faces:
-        landmarks = predictor(gray, face)
-
-        g1 = get_gaze_ratio([36,37,38,39,40,41], landmarks, gray)
-        g2 = get_gaze_ratio([42,43,44,45,46,47], landmarks, gray)
-
-        gaze = (g1 + g2) / 2
-
-        if 0.5 <= gaze <= 2.0:
-            return True
-        else:
-            return False
+        return _is_attended(gray, face)
             
-    return None  # No face detected
\ No newline at end of file
+    return None  # No face detected
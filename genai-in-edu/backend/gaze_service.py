@@ -0,0 +1,201 @@
+# gaze_service.py
+# Multi-user gaze evaluation. Frames from every focus session are collected
+# into micro-batches and spread across a pool of worker processes, each of
+# which loads the dlib detector and landmark predictor once at start-up.
+# Callers get one future per frame, resolving to (result, tracker), where
+# result is evaluate_frame's True/False/None and tracker is the updated
+# face-tracking state to send with that user's next frame.
+# The app starts the service at startup; while it isn't running
+# submit_frame raises GazeServiceUnavailable and callers evaluate in-process.
+# If a worker dies (dlib crash, OOM) the pool is rebuilt once; a pool that
+# breaks again within GAZE_RESTART_WINDOW is given up on, and frames caught
+# in a break fail with GazeServiceUnavailable so they can be redone in-process.
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+GAZE_WORKERS = int(os.getenv("GAZE_WORKERS", str(min(4, os.cpu_count() or 1))))
+GAZE_BATCH_SIZE = int(os.getenv("GAZE_BATCH_SIZE", "8"))
+# How long the dispatcher waits for more frames before sending a batch
+GAZE_BATCH_WAIT = float(os.getenv("GAZE_BATCH_WAIT", "0.02"))
+GAZE_RESTART_WINDOW = float(os.getenv("GAZE_RESTART_WINDOW", "60"))
+
+_queue = queue.Queue()
+_pool = None
+_pool_started = 0.0
+_dispatcher = None
+_lock = threading.Lock()
+
+class GazeServiceUnavailable(RuntimeError):
+    pass
+
+def _init_worker():
+    from focus_tracker import get_detector, get_predictor
+    get_detector()
+    get_predictor()
+
+def _evaluate_batch(items):
+    """Runs in a worker process: decodes and evaluates each (jpeg_bytes, tracker)."""
+    import cv2
+    import numpy as np
+    from focus_tracker import evaluate_frame
+
+    results = []
+    for img_bytes, tracker in items:
+        try:
+            frame = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                results.append((None, tracker, "could not decode image"))
+                continue
+            results.append((evaluate_frame(frame, tracker=tracker), tracker, None))
+        except Exception as e:
+            results.append((None, tracker, str(e)))
+    return results
+
+def _new_pool():
+    ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=GAZE_WORKERS, mp_context=ctx, initializer=_init_worker)
+
+def _handle_broken_pool(pool):
+    global _pool, _pool_started
+    with _lock:
+        if _pool is not pool:
+            # Already replaced or stopped
+            return
+        pool.shutdown(wait=False, cancel_futures=True)
+        if time.monotonic() - _pool_started < GAZE_RESTART_WINDOW:
+            logger.error("Gaze worker pool broke again soon after a restart, evaluating frames in-process")
+            _pool = None
+            return
+        logger.error("Gaze worker pool broke, restarting it")
+        _pool = _new_pool()
+        _pool_started = time.monotonic()
+
+def _fail_unavailable(futures):
+    for future in futures:
+        future.set_exception(GazeServiceUnavailable("Gaze worker pool is unavailable"))
+
+def _resolve(futures, batch_future, pool):
+    try:
+        results = batch_future.result()
+    except BrokenProcessPool:
+        _handle_broken_pool(pool)
+        _fail_unavailable(futures)
+        return
+    except Exception as e:
+        for future in futures:
+            future.set_exception(e)
+        return
+    for future, (result, tracker, error) in zip(futures, results):
+        if error:
+            logger.error(f"Error processing frame: {error}")
+        future.set_result((result, tracker))
+
+def _next_batch():
+    items = [_queue.get()]
+    if items[0] is None:
+        return None
+    deadline = time.monotonic() + GAZE_BATCH_WAIT
+    # Enough to give every worker a full batch
+    limit = GAZE_BATCH_SIZE * GAZE_WORKERS
+    while len(items) < limit:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            item = _queue.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if item is None:
+            _queue.put(None)
+            break
+        items.append(item)
+    return items
+
+def _dispatch_loop():
+    while True:
+        items = _next_batch()
+        if items is None:
+            return
+        # Frames whose caller has already gone away are skipped
+        items = [item for item in items if item[0].set_running_or_notify_cancel()]
+        if not items:
+            continue
+        # Spread the collected frames evenly so every core gets work
+        per_worker = max(1, min(GAZE_BATCH_SIZE, -(-len(items) // GAZE_WORKERS)))
+        for start in range(0, len(items), per_worker):
+            chunk = items[start:start + per_worker]
+            futures = [future for future, _, _ in chunk]
+            pool = _pool
+            if pool is None:
+                _fail_unavailable(futures)
+                continue
+            try:
+                batch_future = pool.submit(_evaluate_batch, [(img, tracker) for _, img, tracker in chunk])
+            except BrokenProcessPool:
+                _handle_broken_pool(pool)
+                _fail_unavailable(futures)
+                continue
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            batch_future.add_done_callback(lambda f, futures=futures, pool=pool: _resolve(futures, f, pool))
+
+def start_gaze_service():
+    global _pool, _pool_started, _dispatcher
+    with _lock:
+        if _dispatcher is not None or GAZE_WORKERS <= 0:
+            return
+        _pool = _new_pool()
+        _pool_started = 0.0
+        _dispatcher = threading.Thread(target=_dispatch_loop, name="gaze-dispatch", daemon=True)
+        _dispatcher.start()
+        logger.info(f"Started gaze service with {GAZE_WORKERS} workers")
+
+def stop_gaze_service():
+    global _pool, _dispatcher
+    with _lock:
+        dispatcher = _dispatcher
+        if dispatcher is None:
+            return
+        _dispatcher = None
+        _queue.put(None)
+    # Joined without the lock, since the dispatcher takes it on a broken pool
+    dispatcher.join()
+    with _lock:
+        pool, _pool = _pool, None
+        # Drop the stop marker so the service can be started again, and fail
+        # anything that arrived after it
+        while not _queue.empty():
+            item = _queue.get_nowait()
+            if item is not None and item[0].set_running_or_notify_cancel():
+                item[0].set_exception(GazeServiceUnavailable("Gaze service stopped"))
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def gaze_service_enabled():
+    return GAZE_WORKERS > 0
+
+def gaze_service_running():
+    return _pool is not None
+
+def submit_frame(img_bytes: bytes, tracker: dict = None):
+    """
+    Queues one JPEG frame and returns a Future of (result, tracker).
+    Raises GazeServiceUnavailable when the service isn't running.
+    """
+    future = Future()
+    # Held so a frame can't slip into the queue after stop_gaze_service drained it
+    with _lock:
+        if _pool is None:
+            raise GazeServiceUnavailable("Gaze service is not running")
+        _queue.put((future, img_bytes, tracker))
+    return future
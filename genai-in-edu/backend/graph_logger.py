@@ -25,7 +25,15 @@ def create_user_profile(user_id: str, name: str):
 # graph_logger.py
 from neo4j import GraphDatabase
 import os
-from datetime import datetime
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
 
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
@@ -36,6 +44,200 @@ driver = GraphDatabase.driver(
     auth=(NEO4J_USERNAME, NEO4J_PASSWORD)
 )
 
+# --- Write-behind telemetry queue ---
+# Telemetry events are buffered in memory and written in batches by a
+# background thread, one UNWIND statement per event kind in one transaction.
+GRAPH_BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "200"))
+GRAPH_FLUSH_INTERVAL = float(os.getenv("GRAPH_FLUSH_INTERVAL", "1.0"))
+GRAPH_QUEUE_SIZE = int(os.getenv("GRAPH_QUEUE_SIZE", "10000"))
+
+_BATCH_QUERIES = {
+    "impatience": """
+        UNWIND $rows AS row
+        MERGE (u:User {user_id: row.user_id})
+        CREATE (i:ImpatienceEvent {
+            trigger: row.trigger_type,
+            timestamp: row.timestamp
+        })
+        MERGE (u)-[:EXPERIENCED]->(i)
+    """,
+    "interaction": """
+        UNWIND $rows AS row
+        MERGE (u:User {user_id: row.user_id})
+        MERGE (c:Content {content_id: row.content_id})
+        SET c.modality = row.modality
+        CREATE (u)-[:INTERACTED_WITH {
+            event_type: row.event_type,
+            timestamp: row.timestamp,
+            duration: row.duration,
+            completion: row.completion,
+            retries: row.retries,
+            hints_used: row.hints_used,
+            feedback_granularity: row.feedback_granularity
+        }]->(c)
+    """,
+    "modality": """
+        UNWIND $rows AS row
+        MERGE (u:User {user_id: row.user_id})
+        MERGE (m:ObservedModality {type: row.modality})
+        MERGE (u)-[r:USES]->(m)
+        SET r.count = coalesce(r.count, 0) + 1,
+            r.total_duration = coalesce(r.total_duration, 0) + row.duration,
+            r.last_event = row.event,
+            r.updated_at = row.timestamp
+    """,
+    "focus": """
+        UNWIND $rows AS row
+        MERGE (u:User {user_id: row.user_id})
+
+        // Create a new session node
+        CREATE (f:FocusSession {
+            session_id: row.session_id,
+            score: row.score,
+            timestamp: row.timestamp,
+            label: CASE
+                WHEN row.score >= 70 THEN "High Focus"
+                WHEN row.score >= 40 THEN "Moderate Focus"
+                ELSE "Low Focus"
+            END
+        })
+
+        MERGE (u)-[:HAS_FOCUS_SESSION]->(f)
+    """,
+}
+
+_event_queue = queue.Queue(maxsize=GRAPH_QUEUE_SIZE)
+_writer_thread = None
+_writer_lock = threading.Lock()
+_STOP = object()
+# Events dropped because the queue was full
+_dropped_events = 0
+
+def _write_batch(events):
+    grouped = {}
+    for kind, row in events:
+        grouped.setdefault(kind, []).append(row)
+
+    def _run(tx):
+        for kind, rows in grouped.items():
+            tx.run(_BATCH_QUERIES[kind], rows=rows)
+
+    try:
+        with driver.session() as session:
+            session.execute_write(_run)
+    except Exception as e:
+        logger.error(f"Dropping {len(events)} graph events after write failure: {e}")
+
+    # Affinity reads between enqueue and write may have cached the old counts
+    for row in grouped.get("modality", []):
+        invalidate_user_profile(row["user_id"])
+
+def _writer_loop():
+    stopping = False
+    while not stopping:
+        batch = []
+        item = _event_queue.get()
+        deadline = time.monotonic() + GRAPH_FLUSH_INTERVAL
+        while True:
+            if item is _STOP:
+                stopping = True
+                _event_queue.task_done()
+                break
+            batch.append(item)
+            if len(batch) >= GRAPH_BATCH_SIZE:
+                break
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = _event_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+        if batch:
+            _write_batch(batch)
+            for _ in batch:
+                _event_queue.task_done()
+
+def _ensure_writer():
+    global _writer_thread
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="graph-writer", daemon=True)
+            _writer_thread.start()
+
+def _enqueue(kind: str, row: dict):
+    global _dropped_events
+    # Stamp events when they happen, not when the batch is written
+    row["timestamp"] = datetime.now(timezone.utc)
+    _ensure_writer()
+    try:
+        # Callers include request handlers on the event loop, so this must
+        # never wait on the queue or on Neo4j
+        _event_queue.put_nowait((kind, row))
+    except queue.Full:
+        _dropped_events += 1
+        if _dropped_events == 1 or _dropped_events % 1000 == 0:
+            logger.warning(f"Graph event queue full, dropped {_dropped_events} events so far (latest: {kind})")
+
+def wait_for_pending_writes():
+    """Blocks until every event queued so far has been written."""
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _event_queue.join()
+
+def flush_graph_writes(timeout: float = 10.0):
+    """Writes out everything still buffered and stops the writer thread."""
+    global _writer_thread
+    with _writer_lock:
+        thread = _writer_thread
+        _writer_thread = None
+    if thread is None or not thread.is_alive():
+        return
+    _event_queue.put(_STOP)
+    thread.join(timeout)
+
+atexit.register(flush_graph_writes)
+
+# --- Profile read-through cache ---
+# Disabilities and modality affinity are read on every chat message but
+# change rarely; writers below invalidate a user's entries explicitly.
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+
+_profile_cache = {}        # (kind, user_id) -> (value, expires_at)
+_profile_generation = {}   # user_id -> bumped on every invalidation
+_profile_lock = threading.Lock()
+_profile_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def _cached_profile(kind: str, user_id: str, loader):
+    now = time.monotonic()
+    with _profile_lock:
+        entry = _profile_cache.get((kind, user_id))
+        if entry is not None and entry[1] > now:
+            _profile_stats["hits"] += 1
+            return entry[0]
+        _profile_stats["misses"] += 1
+        generation = _profile_generation.get(user_id, 0)
+
+    value = loader(user_id)
+
+    with _profile_lock:
+        # Skip the store if the profile was invalidated while we were reading
+        if _profile_generation.get(user_id, 0) == generation:
+            _profile_cache[(kind, user_id)] = (value, now + PROFILE_CACHE_TTL)
+    return value
+
+def invalidate_user_profile(user_id: str):
+    with _profile_lock:
+        _profile_generation[user_id] = _profile_generation.get(user_id, 0) + 1
+        for key in [k for k in _profile_cache if k[1] == user_id]:
+            del _profile_cache[key]
+        _profile_stats["invalidations"] += 1
+
+def get_profile_cache_stats():
+    with _profile_lock:
+        return {"entries": len(_profile_cache), **_profile_stats}
+
 def create_user_profile(user_id: str, name: str):
     with driver.session() as session:
         session.run(
@@ -53,19 +255,7 @@ def get_all_users():
         return [{"user_id": r["user_id"], "name": r["name"]} for r in result]
 
 def log_impatience_event(user_id: str, trigger_type: str):
-    with driver.session() as session:
-        session.run(
-            """
-            MERGE (u:User {user_id: $user_id})
-            CREATE (i:ImpatienceEvent {
-                trigger: $trigger_type,
-                timestamp: datetime()
-            })
-            MERGE (u)-[:EXPERIENCED]->(i)
-            """,
-            user_id=user_id,
-            trigger_type=trigger_type
-        )
+    _enqueue("impatience", {"user_id": user_id, "trigger_type": trigger_type})
 
 def get_impatience_history(user_id: str):
     with driver.session() as session:
@@ -103,32 +293,17 @@ def log_interaction(
     hints_used: int = None,
     feedback_granularity: int = None
 ):
-    with driver.session() as session:
-        session.run(
-            """
-            MERGE (u:User {user_id: $user_id})
-            MERGE (c:Content {content_id: $content_id})
-            SET c.modality = $modality
-            CREATE (u)-[:INTERACTED_WITH {
-                event_type: $event_type,
-                timestamp: datetime(),
-                duration: $duration,
-                completion: $completion,
-                retries: $retries,
-                hints_used: $hints_used,
-                feedback_granularity: $feedback_granularity
-            }]->(c)
-            """,
-            user_id=user_id,
-            content_id=content_id,
-            modality=modality,
-            event_type=event_type,
-            duration=duration,
-            completion=completion,
-            retries=retries,
-            hints_used=hints_used,
-            feedback_granularity=feedback_granularity
-        )
+    _enqueue("interaction", {
+        "user_id": user_id,
+        "content_id": content_id,
+        "modality": modality,
+        "event_type": event_type,
+        "duration": duration,
+        "completion": completion,
+        "retries": retries,
+        "hints_used": hints_used,
+        "feedback_granularity": feedback_granularity,
+    })
 # def log_disability_info(
 #     user_id: str,
 #     disability_name: str,
@@ -207,8 +382,12 @@ def upsert_user_disability(user_id: str,
             severity=severity,
             consent=consent
         )
+    invalidate_user_profile(user_id)
 
 def get_user_disabilities(user_id: str):
+    return _cached_profile("disabilities", user_id, _load_user_disabilities)
+
+def _load_user_disabilities(user_id: str):
     with driver.session() as session:
         result = session.run(
             """
@@ -225,22 +404,8 @@ def get_user_disabilities(user_id: str):
 
         return disabilities
 def log_modality_event(user_id: str, modality: str, event: str, duration: float):
-    with driver.session() as session:
-        session.run(
-            """
-            MERGE (u:User {user_id: $user_id})
-            MERGE (m:ObservedModality {type: $modality})
-            MERGE (u)-[r:USES]->(m)
-            SET r.count = coalesce(r.count, 0) + 1,
-                r.total_duration = coalesce(r.total_duration, 0) + $duration,
-                r.last_event = $event,
-                r.updated_at = datetime()
-            """,
-            user_id=user_id,
-            modality=modality,
-            event=event,
-            duration=duration
-        )
+    _enqueue("modality", {"user_id": user_id, "modality": modality, "event": event, "duration": duration})
+    invalidate_user_profile(user_id)
 def infer_observed_modality(user_id: str):
     with driver.session() as session:
         result = session.run(
@@ -267,6 +432,9 @@ def get_modality_affinity(user_id: str):
     """
     Returns modality preference ranked by affinity score.
     """
+    return _cached_profile("affinity", user_id, _load_modality_affinity)
+
+def _load_modality_affinity(user_id: str):
     with driver.session() as session:
         result = session.run(
             """
@@ -337,34 +505,7 @@ def log_concept_mastery(user_id: str, concept: str, score: float):
             score=score
         )
 def log_focus_score(user_id: str, score: float):
-    from datetime import datetime
-    import uuid
-
-    session_id = str(uuid.uuid4())
-
-    with driver.session() as session:
-        session.run(
-            """
-            MERGE (u:User {user_id: $user_id})
-
-            // Create a new session node
-            CREATE (f:FocusSession {
-                session_id: $session_id,
-                score: $score,
-                timestamp: datetime(),
-                label: CASE
-                    WHEN $score >= 70 THEN "High Focus"
-                    WHEN $score >= 40 THEN "Moderate Focus"
-                    ELSE "Low Focus"
-                END
-            })
-
-            MERGE (u)-[:HAS_FOCUS_SESSION]->(f)
-            """,
-            user_id=user_id,
-            score=score,
-            session_id=session_id
-        )
+    _enqueue("focus", {"user_id": user_id, "score": score, "session_id": str(uuid.uuid4())})
 def get_focus_trend_data(user_id: str):
     with driver.session() as session:
         result = session.run(
@@ -390,6 +531,8 @@ def get_concept_mastery(user_id: str):
         return [{"concept": record["concept"], "score": round(record["score"] * 100, 2)} for record in result]
 
 def delete_user_data(user_id: str):
+    # Buffered events for this user must not be written after the delete
+    wait_for_pending_writes()
     with driver.session() as session:
         session.run(
             """
@@ -404,3 +547,4 @@ def delete_user_data(user_id: str):
             """,
             user_id=user_id
         )
+    invalidate_user_profile(user_id)
@@ -0,0 +1,289 @@
+# render_queue.py
+# Durable video render queue. Jobs live in a local SQLite database and are
+# picked up by separate worker processes, so encodes never run inside the API
+# process and queued or interrupted jobs survive restarts.
+# Workers are started by app.py (RENDER_WORKERS) or standalone with:
+#     python render_queue.py
+# A worker refreshes heartbeat_at on its running job; jobs whose heartbeat
+# is older than RENDER_LEASE_SECONDS belong to a dead worker and are requeued.
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+RENDER_QUEUE_DB = os.getenv("RENDER_QUEUE_DB", "render_jobs.sqlite3")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))
+RENDER_POLL_INTERVAL = float(os.getenv("RENDER_POLL_INTERVAL", "1.0"))
+RENDER_HEARTBEAT_INTERVAL = float(os.getenv("RENDER_HEARTBEAT_INTERVAL", "10"))
+RENDER_LEASE_SECONDS = float(os.getenv("RENDER_LEASE_SECONDS", "60"))
+
+_workers = []
+_stop_event = None
+
+def _connect():
+    conn = sqlite3.connect(RENDER_QUEUE_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def init_queue():
+    conn = _connect()
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS render_jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                script TEXT NOT NULL,
+                user_id TEXT,
+                intent TEXT,
+                modality TEXT,
+                video_url TEXT,
+                progress TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                heartbeat_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(render_jobs)")}
+        if "progress" not in columns:
+            # Databases created before progressive rendering
+            conn.execute("ALTER TABLE render_jobs ADD COLUMN progress TEXT")
+        if "heartbeat_at" not in columns:
+            # Databases created before worker leases
+            conn.execute("ALTER TABLE render_jobs ADD COLUMN heartbeat_at REAL")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS render_jobs_pending ON render_jobs (status, priority DESC, created_at)"
+        )
+    finally:
+        conn.close()
+
+def enqueue_job(script: str, user_id: str, intent: str, modality: str, priority: int = 0):
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            """
+            INSERT INTO render_jobs (job_id, status, priority, script, user_id, intent, modality, created_at, updated_at)
+            VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, priority, script, user_id, intent, modality, now, now)
+        )
+    finally:
+        conn.close()
+    return job_id
+
+def get_job(job_id: str):
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT job_id, status, priority, script, video_url, progress, error FROM render_jobs WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    job = {key: row[key] for key in row.keys() if row[key] is not None}
+    if "progress" in job:
+        job["progress"] = json.loads(job["progress"])
+        job["playlist_url"] = job["progress"].get("playlist_url")
+    return job
+
+def cancel_job(job_id: str):
+    """
+    Cancels a queued job immediately, or asks the worker rendering it to
+    stop at its next checkpoint. Returns False for unknown or finished jobs.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE render_jobs SET status = 'cancelled', updated_at = ? WHERE job_id = ? AND status = 'queued'",
+            (now, job_id)
+        )
+        if cur.rowcount:
+            return True
+        cur = conn.execute(
+            "UPDATE render_jobs SET cancel_requested = 1, updated_at = ? WHERE job_id = ? AND status = 'running'",
+            (now, job_id)
+        )
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+def is_cancel_requested(job_id: str):
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT cancel_requested FROM render_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return bool(row and row["cancel_requested"])
+
+def requeue_interrupted_jobs():
+    """
+    Puts jobs left 'running' by a crashed or stopped worker back in the
+    queue. Jobs whose worker is still heartbeating are left alone.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            """
+            UPDATE render_jobs SET status = 'queued', updated_at = ?
+            WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+            """,
+            (now, now - RENDER_LEASE_SECONDS)
+        )
+        if cur.rowcount:
+            logger.info(f"Requeued {cur.rowcount} interrupted render jobs")
+    finally:
+        conn.close()
+
+def _claim_next_job(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            """
+            SELECT job_id, script, user_id, intent, modality FROM render_jobs
+            WHERE status = 'queued'
+            ORDER BY priority DESC, created_at
+            LIMIT 1
+            """
+        ).fetchone()
+        if row is not None:
+            now = time.time()
+            conn.execute(
+                "UPDATE render_jobs SET status = 'running', progress = NULL, heartbeat_at = ?, updated_at = ? WHERE job_id = ?",
+                (now, now, row["job_id"])
+            )
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _update_job(conn, job_id: str, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{key} = ?" for key in fields)
+    conn.execute(f"UPDATE render_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+def _heartbeat(job_id: str, done):
+    # Own connection: sqlite3 connections can't be shared across threads
+    conn = _connect()
+    try:
+        while not done.wait(RENDER_HEARTBEAT_INTERVAL):
+            try:
+                conn.execute(
+                    "UPDATE render_jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'",
+                    (time.time(), job_id)
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Heartbeat for render job {job_id} failed: {e}")
+    finally:
+        conn.close()
+
+def _run_job(conn, job):
+    # Imported here so the API process never loads MoviePy for the queue
+    from video_generator import create_video_from_script, RenderCancelled
+    from graph_logger import log_interaction
+
+    job_id = job["job_id"]
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, done), name=f"heartbeat-{job_id[:8]}", daemon=True)
+    heartbeat.start()
+    try:
+        output_filename = f"{job_id}.mp4"
+        video_path = create_video_from_script(
+            job["script"],
+            output_filename,
+            should_cancel=lambda: is_cancel_requested(job_id),
+            progress=lambda p: _update_job(conn, job_id, progress=json.dumps(p))
+        )
+        if video_path and os.path.exists(video_path):
+            _update_job(conn, job_id, status="completed", video_url=f"/videos/{output_filename}")
+            log_interaction(user_id=job["user_id"], content_id="video_generation", event_type=job["intent"], modality=job["modality"])
+        else:
+            _update_job(conn, job_id, status="failed", error="Video path does not exist")
+    except RenderCancelled:
+        logger.info(f"Render job {job_id} cancelled")
+        _update_job(conn, job_id, status="cancelled")
+    except Exception as e:
+        logger.error(f"Error in video task: {e}")
+        _update_job(conn, job_id, status="failed", error=str(e))
+    finally:
+        done.set()
+        heartbeat.join()
+
+def worker_loop(stop_event=None):
+    logging.basicConfig(level=logging.INFO)
+    conn = _connect()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                job = _claim_next_job(conn)
+                if job is None:
+                    # Idle workers also pick up jobs whose worker died
+                    requeue_interrupted_jobs()
+                    time.sleep(RENDER_POLL_INTERVAL)
+                    continue
+                _run_job(conn, job)
+            except Exception as e:
+                # A locked database or a failed status update must not kill the worker
+                logger.error(f"Render worker error: {type(e).__name__}: {e}")
+                time.sleep(RENDER_POLL_INTERVAL)
+    finally:
+        conn.close()
+        from graph_logger import flush_graph_writes
+        flush_graph_writes()
+
+def start_workers(count: int = RENDER_WORKERS):
+    """Starts the render worker processes. Safe to call once per process."""
+    global _stop_event
+    # The API process needs the table even when the workers run elsewhere
+    init_queue()
+    if _workers or count <= 0:
+        return
+    requeue_interrupted_jobs()
+    ctx = multiprocessing.get_context("spawn")
+    _stop_event = ctx.Event()
+    for i in range(count):
+        # Not daemonic: workers start their own pools for slide rendering
+        process = ctx.Process(target=worker_loop, args=(_stop_event,), name=f"render-worker-{i}")
+        process.start()
+        _workers.append(process)
+    logger.info(f"Started {count} render workers")
+
+def stop_workers(timeout: float = 10.0):
+    if not _workers:
+        return
+    _stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in _workers:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            # The interrupted job stays 'running' until its lease expires,
+            # then another worker requeues it
+            process.terminate()
+            process.join()
+    _workers.clear()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_workers(RENDER_WORKERS)
+    try:
+        for process in list(_workers):
+            process.join()
+    except KeyboardInterrupt:
+        stop_workers()
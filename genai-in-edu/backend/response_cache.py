@@ -0,0 +1,201 @@
+# response_cache.py
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+# Set to a directory to keep exact-match responses across restarts
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "")
+# Above 0.8 so that one extra term on a short question (4 of 5) is a miss
+SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.85"))
+SIMILARITY_ENTRIES_PER_SCOPE = int(os.getenv("RESPONSE_CACHE_SCOPE_SIZE", "256"))
+SIMILARITY_SCOPES = int(os.getenv("RESPONSE_CACHE_SCOPES", "1024"))
+
+# Words that change how a question is phrased but not what it asks about
+QUESTION_WORDS = {"explain", "define", "definition", "tell", "mean", "meaning", "please", "briefly", "concept", "does", "did"}
+# Stop words that change what is asked; two questions only share an answer
+# when they use exactly the same ones
+MARKER_WORDS = {
+    "not", "no", "nor", "never", "without", "except", "cannot",
+    "how", "why", "when", "where", "which", "who", "whom", "whose",
+}
+
+class ResponseCache:
+    """LRU + TTL cache of LLM responses with an optional SQLite backend."""
+
+    def __init__(self, max_entries: int, ttl: float, db_path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - ttl,))
+            self._db.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, value, now)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Response cache write failed: {e}")
+
+    def _store(self, key, value, created_at):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class SimilarityCache:
+    """
+    Second tier keyed by the content words of a question, so rephrasings
+    such as "what is a private cloud" and "explain private cloud" share an
+    answer within the same scope (document, modality, learner profile).
+    Negations and question words (MARKER_WORDS) must match exactly, so
+    "why use X" never answers "when to use X". Only the max_scopes most
+    recently used scopes are kept.
+    """
+
+    def __init__(self, threshold: float, entries_per_scope: int, ttl: float, max_scopes: int):
+        self.threshold = threshold
+        self.entries_per_scope = entries_per_scope
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self.hits = 0
+        self.misses = 0
+        # Least recently used scope first
+        self._scopes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, question: str):
+        markers, terms = question_key(question)
+        if not terms:
+            return None
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is not None:
+                self._scopes.move_to_end(scope)
+            best_key, best_score = None, 0.0
+            for key, (value, created_at) in list((entries or {}).items()):
+                if now - created_at >= self.ttl:
+                    del entries[key]
+                    continue
+                if key[0] != markers:
+                    continue
+                score = len(terms & key[1]) / len(terms | key[1])
+                if score > best_score:
+                    best_key, best_score = key, score
+            if best_key is not None and best_score >= self.threshold:
+                entries.move_to_end(best_key)
+                self.hits += 1
+                return entries[best_key][0]
+            self.misses += 1
+            return None
+
+    def set(self, scope: str, question: str, value: str):
+        key = question_key(question)
+        if not key[1]:
+            return
+        with self._lock:
+            entries = self._scopes.setdefault(scope, OrderedDict())
+            self._scopes.move_to_end(scope)
+            entries[key] = (value, time.time())
+            entries.move_to_end(key)
+            while len(entries) > self.entries_per_scope:
+                entries.popitem(last=False)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def stats(self):
+        return {"scopes": len(self._scopes), "hits": self.hits, "misses": self.misses}
+
+def normalize_text(text: str):
+    return " ".join(text.lower().split())
+
+def question_key(question: str):
+    """(marker words, content terms) of a question, see MARKER_WORDS."""
+    question = question.lower().replace("can't", "can not").replace("won't", "will not").replace("n't", " not")
+    markers = set()
+    terms = set()
+    for word in re.findall(r"[a-z0-9]+", question):
+        if word in MARKER_WORDS:
+            markers.add(word)
+            continue
+        if word in ENGLISH_STOP_WORDS or word in QUESTION_WORDS:
+            continue
+        # Fold simple plurals so "clouds" matches "cloud"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return frozenset(markers), frozenset(terms)
+
+def make_key(messages: list, model: str, temperature: float, max_tokens: int):
+    normalized = [{"role": m["role"], "content": normalize_text(m["content"])} for m in messages]
+    payload = json.dumps([normalized, model, temperature, max_tokens], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def make_scope(*parts):
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+_db_path = None
+if RESPONSE_CACHE_DIR:
+    os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+    _db_path = os.path.join(RESPONSE_CACHE_DIR, "responses.sqlite3")
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, _db_path)
+similar_cache = SimilarityCache(SIMILARITY_THRESHOLD, SIMILARITY_ENTRIES_PER_SCOPE, RESPONSE_CACHE_TTL, SIMILARITY_SCOPES)
+
+def cache_stats():
+    return {"exact": response_cache.stats(), "similar": similar_cache.stats()}
@@ -1,85 +1,381 @@
 import fitz  # PyMuPDF
-from groq import Groq
+from groq import AsyncGroq
+import httpx
+import asyncio
 import os
-import time
+import math
 import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
 from dotenv import load_dotenv
 load_dotenv()
+from response_cache import response_cache, similar_cache, make_key
 
 logger = logging.getLogger(__name__)
 
 # Initialize Groq client
 GROQ_API = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API) if GROQ_API else None
 GROQ_MODEL = os.getenv("GROQ_MODEL", "groq/compound")
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "64"))
+GROQ_MODEL_CONCURRENCY = int(os.getenv("GROQ_MODEL_CONCURRENCY", "16"))
+
+# One pooled HTTP client shared by every LLM call in the process
+client = AsyncGroq(
+    api_key=GROQ_API,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    )
+) if GROQ_API else None
 
 FALLBACK_MODELS = [GROQ_MODEL, "groq/compound", "groq/compound-mini", "qwen/qwen3.6-27b"]
 
-def _call_groq_with_fallback(messages, max_tokens=500, temperature=0.6):
-    if not client:
-        return "Error: Groq client not initialized. Please check GROQ_API_KEY."
+# Per-model cap on in-flight requests, created lazily on the running loop
+_model_semaphores = {}
+
+def _model_semaphore(model):
+    semaphore = _model_semaphores.get(model)
+    if semaphore is None:
+        semaphore = _model_semaphores[model] = asyncio.Semaphore(GROQ_MODEL_CONCURRENCY)
+    return semaphore
+
+def _is_rate_limit(error):
+    err_str = str(error).lower()
+    return "429" in err_str or "rate_limit" in err_str
+
+async def _stream_deltas(model, messages, max_tokens, temperature):
+    stream = await client.chat.completions.create(
+        messages=messages,
+        model=model,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True
+    )
+    # Reasoning models open with a <think> block that is dropped,
+    # so hold text back until we know whether one is coming
+    pending = ""
+    passthrough = False
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            continue
+        if passthrough:
+            yield delta
+            continue
+        pending += delta
+        head = pending.lstrip()
+        if "</think>" in pending:
+            text = pending.split("</think>")[-1].lstrip()
+        elif head.startswith("<think>") or "<think>".startswith(head):
+            continue
+        else:
+            text = head
+        passthrough = True
+        if text:
+            yield text
+    if not passthrough and pending.strip():
+        yield pending.strip()
 
+async def _groq_completion(messages, max_tokens, temperature, models, stream=False):
+    """
+    Model fallback loop shared by the blocking and streaming calls. Yields
+    (model, text) pieces: the whole reply at once, or deltas when streaming.
+    Rate limits are retried and other errors move on to the next model, but
+    only while nothing has been yielded yet. If every model fails a single
+    "Error: ..." piece with model None is yielded.
+    """
     seen_models = set()
     last_error = None
 
-    for model in FALLBACK_MODELS:
+    for model in models:
         if model in seen_models:
             continue
         seen_models.add(model)
 
         for attempt in range(2):
+            sent = False
             try:
-                response = client.chat.completions.create(
-                    messages=messages,
-                    model=model,
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )
-                content = response.choices[0].message.content.strip()
-                if "</think>" in content:
-                    content = content.split("</think>")[-1].strip()
-                return content
+                async with _model_semaphore(model):
+                    if stream:
+                        async for text in _stream_deltas(model, messages, max_tokens, temperature):
+                            sent = True
+                            yield model, text
+                    else:
+                        response = await client.chat.completions.create(
+                            messages=messages,
+                            model=model,
+                            max_tokens=max_tokens,
+                            temperature=temperature
+                        )
+                        content = response.choices[0].message.content.strip()
+                        if "</think>" in content:
+                            content = content.split("</think>")[-1].strip()
+                        sent = True
+                        yield model, content
+                return
             except Exception as e:
+                if sent:
+                    raise
                 last_error = e
-                err_str = str(e).lower()
-                if "429" in err_str or "rate_limit" in err_str:
+                if _is_rate_limit(e):
                     logger.warning(f"Rate limit on model {model}, attempt {attempt+1}. Backing off...")
-                    time.sleep(1.5)
+                    await asyncio.sleep(1.5)
                     continue
                 else:
                     logger.error(f"Error calling model {model}: {e}")
                     break
 
-    return f"Error: Rate limit reached. Please wait a moment and try again. Details: {last_error}"
+    yield None, f"Error: Rate limit reached. Please wait a moment and try again. Details: {last_error}"
+
+def _cached_reply(messages, max_tokens, temperature, models):
+    # Replies are keyed by the model that wrote them; any model this call
+    # could have fallen back to is an acceptable answer
+    for model in dict.fromkeys(models):
+        cached = response_cache.get(make_key(messages, model, temperature, max_tokens))
+        if cached is not None:
+            return cached
+    return None
+
+def _cache_reply(messages, max_tokens, temperature, model, content):
+    if model and content and not content.startswith("Error:"):
+        response_cache.set(make_key(messages, model, temperature, max_tokens), content)
+
+async def _call_groq_with_fallback(messages, max_tokens=500, temperature=0.6, models=None, use_cache=True):
+    if not client:
+        return "Error: Groq client not initialized. Please check GROQ_API_KEY."
+
+    models = models or FALLBACK_MODELS
+    if use_cache:
+        cached = _cached_reply(messages, max_tokens, temperature, models)
+        if cached is not None:
+            return cached
+
+    content = ""
+    answered_by = None
+    async for model, text in _groq_completion(messages, max_tokens, temperature, models):
+        content += text
+        answered_by = model
+    if use_cache:
+        _cache_reply(messages, max_tokens, temperature, answered_by, content)
+    return content
+
+async def _stream_groq_with_fallback(messages, max_tokens=500, temperature=0.6, models=None):
+    """
+    Streaming counterpart of _call_groq_with_fallback, yielding text deltas.
+    Falls back to the next model only while nothing has been sent yet.
+    """
+    if not client:
+        yield "Error: Groq client not initialized. Please check GROQ_API_KEY."
+        return
+
+    models = models or FALLBACK_MODELS
+    cached = _cached_reply(messages, max_tokens, temperature, models)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    answered_by = None
+    async for model, text in _groq_completion(messages, max_tokens, temperature, models, stream=True):
+        parts.append(text)
+        answered_by = model
+        yield text
+    _cache_reply(messages, max_tokens, temperature, answered_by, "".join(parts).strip())
+
+async def close_llm_client():
+    if client:
+        await client.close()
 
 # --- PDF Text Extraction ---
-def extract_text_from_pdf(file_bytes):
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_MIN_PAGES_PER_SHARD = int(os.getenv("PDF_MIN_PAGES_PER_SHARD", "8"))
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pdf_pool
+
+def _extract_page_range(pdf_path, start, stop):
+    doc = fitz.open(pdf_path, filetype="pdf")
+    try:
+        return [doc[i].get_text() for i in range(start, stop)]
+    finally:
+        doc.close()
+
+def iter_pdf_pages(file_bytes):
+    """
+    Yields the text of each page in order. Large documents are split into
+    contiguous page ranges that are extracted in parallel by a process pool;
+    pages are yielded as soon as the shard holding them is done.
+    """
     doc = fitz.open(stream=file_bytes, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
+    page_count = doc.page_count
+    if PDF_WORKERS <= 1 or page_count < 2 * PDF_MIN_PAGES_PER_SHARD:
+        try:
+            for page in doc:
+                yield page.get_text()
+        finally:
+            doc.close()
+        return
     doc.close()
-    return text
+
+    # Shards open a shared copy on disk instead of each pickling the whole upload
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(file_bytes)
+        pdf_path = f.name
+
+    shard_size = max(PDF_MIN_PAGES_PER_SHARD, math.ceil(page_count / (PDF_WORKERS * 2)))
+    pool = _get_pdf_pool()
+    futures = []
+    try:
+        futures = [
+            pool.submit(_extract_page_range, pdf_path, start, min(start + shard_size, page_count))
+            for start in range(0, page_count, shard_size)
+        ]
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        # Shards still running have the file open, which blocks removal on Windows
+        wait(futures)
+        try:
+            os.remove(pdf_path)
+        except OSError as e:
+            logger.warning(f"Could not remove temporary PDF {pdf_path}: {e}")
+
+def extract_text_from_pdf(file_bytes, stream=False):
+    if stream:
+        return iter_pdf_pages(file_bytes)
+    return "".join(iter_pdf_pages(file_bytes))
 
 # --- Summarization ---
-def summarize_text(text):
+async def summarize_text(text):
     truncated = text[:2500] if text else ""
     messages = [
         {"role": "system", "content": "You are a concise, helpful academic assistant. Provide a structured summary of the key concepts and ideas."},
         {"role": "user", "content": f"Summarize the following text clearly:\n\n{truncated}"}
     ]
-    return _call_groq_with_fallback(messages, max_tokens=400)
+    return await _call_groq_with_fallback(messages, max_tokens=400)
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_BATCH_CHARS = int(os.getenv("SUMMARY_BATCH_CHARS", "6000"))
+
+async def _summarize_piece(text, instruction, max_tokens):
+    messages = [
+        {"role": "system", "content": "You are a concise, helpful academic assistant. Provide a structured summary of the key concepts and ideas."},
+        {"role": "user", "content": f"{instruction}\n\n{text}"}
+    ]
+    return await _call_groq_with_fallback(messages, max_tokens=max_tokens)
+
+def _batch_summaries(summaries):
+    # Every batch takes at least two summaries so each reduce round shrinks
+    batches, current, size = [], [], 0
+    for summary in summaries:
+        if len(current) >= 2 and size + len(summary) > SUMMARY_BATCH_CHARS:
+            batches.append(current)
+            current, size = [], 0
+        current.append(summary)
+        size += len(summary)
+    if current:
+        batches.append(current)
+    return batches
+
+async def summarize_document(chunks, chunk_summaries=None):
+    """
+    Map-reduce summary of a whole document. Each chunk is summarised in
+    parallel (at most SUMMARY_CONCURRENCY calls in flight), then the partial
+    summaries are merged in batches until one remains.
+    chunk_summaries maps chunk index -> summary from an earlier run and is
+    filled in and returned alongside the final summary.
+    Returns (summary, chunk_summaries, complete); complete is False when any
+    chunk or merge call failed, so the summary only covers part of the text.
+    """
+    chunk_summaries = dict(chunk_summaries or {})
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def _limited(text, instruction, max_tokens):
+        async with semaphore:
+            return await _summarize_piece(text, instruction, max_tokens)
+
+    async def _map(i, chunk):
+        if i not in chunk_summaries:
+            summary = await _limited(chunk, "Summarize this section of a document in a few bullet points:", 200)
+            if not summary.startswith("Error:"):
+                chunk_summaries[i] = summary
+
+    await asyncio.gather(*(_map(i, chunk) for i, chunk in enumerate(chunks)))
+    summaries = [chunk_summaries[i] for i in range(len(chunks)) if i in chunk_summaries]
+    complete = len(summaries) == len(chunks)
+    if not summaries:
+        return "", chunk_summaries, False
+
+    while True:
+        batches = _batch_summaries(summaries)
+        if len(batches) == 1:
+            final = await _summarize_piece(
+                "\n\n".join(batches[0]),
+                "Combine these section summaries into one structured summary of the whole document:",
+                400
+            )
+            return final, chunk_summaries, complete and not final.startswith("Error:")
+        summaries = await asyncio.gather(*(
+            _limited("\n\n".join(batch), "Merge these section summaries into one shorter summary:", 300)
+            for batch in batches
+        ))
+        merged = [summary for summary in summaries if not summary.startswith("Error:")]
+        complete = complete and len(merged) == len(summaries)
+        summaries = merged
+        if not summaries:
+            return "", chunk_summaries, False
 
 # --- Question Answering ---
-def ask_question(context, question):
+def _question_messages(context, question):
     truncated_context = context[:2000] if context else "No context provided."
-    messages = [
+    return [
         {"role": "system", "content": "You are an adaptive, encouraging educational tutor. Provide clear, structured explanations with relevant examples."},
         {"role": "user", "content": f"Context:\n{truncated_context}\n\nQuestion:\n{question}"}
     ]
-    return _call_groq_with_fallback(messages, max_tokens=600)
 
-def generate_quiz(context, topic):
+async def ask_question(context, question, cache_scope=None):
+    # cache_scope groups requests that may share an answer for a rephrased question
+    if cache_scope:
+        cached = similar_cache.get(cache_scope, question)
+        if cached is not None:
+            return cached
+    answer = await _call_groq_with_fallback(_question_messages(context, question), max_tokens=600)
+    if cache_scope and not answer.startswith("Error:"):
+        similar_cache.set(cache_scope, question, answer)
+    return answer
+
+async def ask_question_stream(context, question, cache_scope=None):
+    if cache_scope:
+        cached = similar_cache.get(cache_scope, question)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    async for token in _stream_groq_with_fallback(_question_messages(context, question), max_tokens=600):
+        parts.append(token)
+        yield token
+    answer = "".join(parts).strip()
+    if cache_scope and answer and not answer.startswith("Error:"):
+        similar_cache.set(cache_scope, question, answer)
+
+async def generate_quiz(context, topic):
     if not client:
         return {"error": "Groq client not initialized."}
     try:
@@ -105,7 +401,7 @@ def generate_quiz(context, topic):
             {"role": "system", "content": "You are an educational quiz generator. Output ONLY a valid JSON list of 3 questions."},
             {"role": "user", "content": prompt}
         ]
-        content = _call_groq_with_fallback(messages, max_tokens=500, temperature=0.3)
+        content = await _call_groq_with_fallback(messages, max_tokens=500, temperature=0.3)
 
         import json
         import re
@@ -126,7 +422,7 @@ def generate_quiz(context, topic):
         logger.error(f"Quiz parsing error: {e}")
         return {"error": str(e)}
 
-def explain_mistakes(wrong_concepts):
+async def explain_mistakes(wrong_concepts):
     prompt = f"""
     A student answered the following questions incorrectly:
     {wrong_concepts}
@@ -140,7 +436,7 @@ def explain_mistakes(wrong_concepts):
         {"role": "system", "content": "You are an empathetic, clear educational tutor."},
         {"role": "user", "content": prompt}
     ]
-    return _call_groq_with_fallback(messages, max_tokens=600)
+    return await _call_groq_with_fallback(messages, max_tokens=600)
 
 def extract_concept(text):
     if not text:
@@ -0,0 +1,70 @@
+# retrieval.py
+import logging
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 300
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE):
+    words = text.split()
+    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+
+def chunk_pages(pages, chunk_size: int = CHUNK_SIZE):
+    """
+    Streaming version of chunk_text over an iterable of page texts.
+    Produces exactly the chunks chunk_text would for "".join(pages), but
+    yields each one as soon as enough words have arrived.
+    """
+    words = []
+    carry = ""
+    for page in pages:
+        text = carry + page
+        carry = ""
+        page_words = text.split()
+        # A word cut at the end of a page may continue on the next one
+        if page_words and not text[-1].isspace():
+            carry = page_words.pop()
+        words.extend(page_words)
+        while len(words) >= chunk_size:
+            yield ' '.join(words[:chunk_size])
+            del words[:chunk_size]
+    if carry:
+        words.append(carry)
+    for i in range(0, len(words), chunk_size):
+        yield ' '.join(words[i:i + chunk_size])
+
+def build_chunk_index(chunks: list):
+    """
+    Fits the TF-IDF model over a document's chunks once.
+    Rows of the matrix are L2-normalised by the vectorizer, so cosine
+    similarity against a query reduces to a sparse dot product.
+    """
+    if not chunks:
+        return None
+    try:
+        vectorizer = TfidfVectorizer(stop_words='english')
+        matrix = vectorizer.fit_transform(chunks)
+        return {"vectorizer": vectorizer, "matrix": matrix}
+    except Exception as e:
+        logger.error(f"Error building chunk index: {e}")
+        return None
+
+def find_relevant_chunks(query: str, chunks: list, top_k: int = 5, index: dict = None):
+    if not chunks:
+        return ""
+    if len(chunks) <= top_k:
+        return " ".join(chunks)
+    try:
+        if index is None:
+            index = build_chunk_index(chunks)
+        if index is None:
+            return " ".join(chunks[:top_k])
+        query_vec = index["vectorizer"].transform([query])
+        similarities = (index["matrix"] @ query_vec.T).toarray().ravel()
+        top_indices = similarities.argsort()[::-1][:top_k]
+        relevant = [chunks[i] for i in top_indices if similarities[i] > 0]
+        return " ".join(relevant) if relevant else " ".join(chunks[:top_k])
+    except Exception as e:
+        logger.error(f"Error in chunk retrieval: {e}")
+        return " ".join(chunks[:top_k])
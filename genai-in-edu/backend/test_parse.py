@@ -1,6 +1,16 @@
+import sys
+import glob
+import os
+
 import video_generator
 
-with open('temp_video_assets/debug_script.txt', 'r', encoding='utf-8') as f:
+# A failed job's raw script, or the most recent one kept in temp_video_assets
+if len(sys.argv) > 1:
+    debug_path = sys.argv[1]
+else:
+    debug_path = max(glob.glob(os.path.join(video_generator.TEMP_ASSETS_DIR, 'debug_*.txt')), key=os.path.getmtime)
+
+with open(debug_path, 'r', encoding='utf-8') as f:
     text = f.read()
 
 scenes = video_generator.parse_video_script(text)
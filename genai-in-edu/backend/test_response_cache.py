@@ -0,0 +1,52 @@
+from response_cache import SimilarityCache
+
+# Rephrasings that must share an answer
+MUST_MATCH = [
+    ("what is a private cloud", "explain private cloud"),
+    ("What are private clouds?", "define private cloud"),
+    ("how does a load balancer work", "How do load balancers work?"),
+    ("why is encryption used", "why is encryption used?"),
+]
+
+# Questions that ask something different and must not
+MUST_NOT_MATCH = [
+    ("what is a private cloud", "what is not a private cloud"),
+    ("what is a private cloud", "what isn't a private cloud"),
+    ("why use a private cloud", "when to use a private cloud"),
+    ("how does a load balancer work", "why does a load balancer work"),
+    ("deploy containers with kubernetes", "deploy containers without kubernetes"),
+    ("private cloud storage cost", "private cloud storage cost model"),
+]
+
+
+def new_cache(max_scopes=16):
+    return SimilarityCache(threshold=0.85, entries_per_scope=16, ttl=60, max_scopes=max_scopes)
+
+
+def test_rephrasings_match():
+    for cached, asked in MUST_MATCH:
+        cache = new_cache()
+        cache.set("scope", cached, "answer")
+        assert cache.get("scope", asked) == "answer", (cached, asked)
+
+
+def test_different_questions_do_not_match():
+    for cached, asked in MUST_NOT_MATCH:
+        cache = new_cache()
+        cache.set("scope", cached, "answer")
+        assert cache.get("scope", asked) is None, (cached, asked)
+
+
+def test_scopes_are_bounded():
+    cache = new_cache(max_scopes=2)
+    for scope in ("a", "b", "c"):
+        cache.set(scope, "what is a private cloud", scope)
+    assert cache.get("a", "what is a private cloud") is None
+    assert cache.get("c", "what is a private cloud") == "c"
+
+
+if __name__ == "__main__":
+    test_rephrasings_match()
+    test_different_questions_do_not_match()
+    test_scopes_are_bounded()
+    print("response cache matching OK")
@@ -0,0 +1,231 @@
+# tts_engine.py
+# Text-to-speech shared by /generate-audio and the video narration.
+# Audio is cached on disk under generated_videos/tts keyed by
+# (backend, text, voice, speed), so repeated text is never synthesized twice
+# and cached files can be served directly from /videos/tts. Least recently
+# used files are removed once the cache passes TTS_CACHE_MAX_BYTES.
+#
+# Backends (TTS_BACKEND):
+#   gtts     - Google TTS, needs network. Long text is split into sentence
+#              chunks that are synthesized in parallel and joined.
+#   pyttsx3  - offline system voices, writes wav.
+import os
+import io
+import re
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts").lower()
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "400"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))
+# Lives inside the static /videos mount so cached audio can be linked to
+TTS_CACHE_DIR = os.path.join("generated_videos", "tts")
+
+os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+
+_pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+_lock = threading.Lock()
+_build_locks = {}
+# pyttsx3 drives a single native engine that isn't thread-safe
+_pyttsx3_lock = threading.Lock()
+_pyttsx3_engine = None
+_pyttsx3_rate = 200
+_pyttsx3_default_voice = None
+
+# Voices each backend accepts. For gTTS a voice is the Google domain that
+# picks the English accent, so it must never be taken from user input as is
+GTTS_VOICES = {"com", "co.uk", "com.au", "ca", "co.in", "ie", "co.za"}
+PYTTSX3_VOICES = {"female", "male"}
+# Explicit system voice ids, e.g. "female=<id>,male=<id>", for platforms
+# whose voices don't report a gender
+PYTTSX3_VOICE_IDS = dict(
+    item.split("=", 1) for item in os.getenv("PYTTSX3_VOICE_IDS", "").split(",") if "=" in item
+)
+# Common system voices by gender, used when a voice reports none (SAPI5)
+PYTTSX3_VOICE_NAMES = {
+    "female": {"zira", "hazel", "susan", "samantha", "victoria", "karen", "moira", "tessa"},
+    "male": {"david", "mark", "george", "alex", "daniel", "fred", "tom"},
+}
+
+def normalize_text(text: str):
+    return " ".join(text.split())
+
+def split_sentences(text: str, max_chars: int = TTS_CHUNK_CHARS):
+    """Groups sentences into chunks of at most max_chars (a longer sentence stays whole)."""
+    chunks = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def normalize_voice(voice):
+    """Returns the backend's canonical voice, or raises ValueError for an unknown one."""
+    if voice is None or not str(voice).strip():
+        return "female" if TTS_BACKEND == "pyttsx3" else "com"
+    voice = str(voice).strip().lower()
+    allowed = PYTTSX3_VOICES if TTS_BACKEND == "pyttsx3" else GTTS_VOICES
+    if voice not in allowed:
+        raise ValueError(f"Unknown voice '{voice}'. Choose one of: {', '.join(sorted(allowed))}")
+    return voice
+
+def normalize_speed(speed):
+    speed = float(speed or 1.0)
+    if TTS_BACKEND == "pyttsx3":
+        return round(min(max(speed, 0.5), 2.0), 1)
+    # gTTS only has a normal and a slow rate
+    return 0.5 if speed < 1.0 else 1.0
+
+def _cache_path(text: str, voice, speed: float):
+    ext = "wav" if TTS_BACKEND == "pyttsx3" else "mp3"
+    payload = json.dumps([TTS_BACKEND, text, voice, speed])
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{key}.{ext}")
+
+def _gtts_chunk(text: str, voice, speed: float):
+    from gtts import gTTS
+    buffer = io.BytesIO()
+    # gTTS voices are regional accents selected by Google domain
+    gTTS(text=text, lang='en', tld=voice, slow=speed < 1.0).write_to_fp(buffer)
+    return buffer.getvalue()
+
+def _synthesize_gtts(text: str, voice, speed: float, out_path: str):
+    chunks = split_sentences(text)
+    futures = [_pool.submit(_gtts_chunk, chunk, voice, speed) for chunk in chunks]
+    # MP3 is a sequence of independent frames, so the parts can be appended
+    # the same way gTTS joins its own request chunks
+    with open(out_path, "wb") as f:
+        for future in futures:
+            f.write(future.result())
+
+def _pyttsx3_voice_gender(v):
+    # drivers report "female", "Female" or (nsss) "VoiceGenderFemale"
+    gender = (getattr(v, "gender", None) or "").lower().replace("voicegender", "")
+    if gender in PYTTSX3_VOICES:
+        return gender
+    words = set(re.findall(r"[a-z]+", (v.name or "").lower()))
+    for name, known in PYTTSX3_VOICE_NAMES.items():
+        if words & known:
+            return name
+    return None
+
+def _pyttsx3_voice_id(voices, voice):
+    """System voice id for "female"/"male", or the engine default if none fits."""
+    if voice in PYTTSX3_VOICE_IDS:
+        return PYTTSX3_VOICE_IDS[voice]
+    for v in voices:
+        if _pyttsx3_voice_gender(v) == voice:
+            return v.id
+    return _pyttsx3_default_voice
+
+def _synthesize_pyttsx3(text: str, voice, speed: float, out_path: str):
+    global _pyttsx3_engine, _pyttsx3_rate, _pyttsx3_default_voice
+    with _pyttsx3_lock:
+        if _pyttsx3_engine is None:
+            import pyttsx3
+            _pyttsx3_engine = pyttsx3.init()
+            _pyttsx3_rate = _pyttsx3_engine.getProperty("rate")
+            _pyttsx3_default_voice = _pyttsx3_engine.getProperty("voice")
+        engine = _pyttsx3_engine
+
+        # Always set, so a voice left over from the previous call on this
+        # shared engine never ends up cached under another key
+        voice_id = _pyttsx3_voice_id(engine.getProperty("voices"), voice)
+        if voice_id is not None:
+            engine.setProperty("voice", voice_id)
+        engine.setProperty("rate", int(_pyttsx3_rate * speed))
+
+        engine.save_to_file(text, out_path)
+        engine.runAndWait()
+
+def synthesize(text: str, voice: str = None, speed: float = 1.0):
+    """
+    Returns the path of an audio file speaking text, synthesizing it only
+    if it isn't cached yet. Returns None when there is nothing to say or
+    the backend fails. Raises ValueError for a voice the backend doesn't offer.
+    """
+    voice = normalize_voice(voice)
+    speed = normalize_speed(speed)
+    text = normalize_text(text or "")
+    if not text:
+        return None
+
+    path = _cache_path(text, voice, speed)
+    if _touch_cached(path):
+        return path
+
+    with _lock:
+        build_lock = _build_locks.setdefault(path, threading.Lock())
+
+    with build_lock:
+        # A concurrent request for the same text may have just finished it
+        if _touch_cached(path):
+            return path
+
+        ext = os.path.splitext(path)[1]
+        tmp_path = f"{path[:-len(ext)]}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+        try:
+            if TTS_BACKEND == "pyttsx3":
+                _synthesize_pyttsx3(text, voice, speed, tmp_path)
+            else:
+                _synthesize_gtts(text, voice, speed, tmp_path)
+            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+                logger.error("TTS produced an empty file")
+                return None
+            os.replace(tmp_path, path)
+            evict_tts_cache()
+            return path
+        except Exception as e:
+            logger.error(f"TTS error ({TTS_BACKEND}): {type(e).__name__}: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with _lock:
+                _build_locks.pop(path, None)
+
+def _touch_cached(path):
+    try:
+        if os.path.getsize(path) == 0:
+            return False
+        # mtime doubles as last use for eviction
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def evict_tts_cache(max_bytes=None):
+    """Deletes least recently used audio until the cache fits in max_bytes."""
+    max_bytes = TTS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for entry in os.scandir(TTS_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith((".mp3", ".wav")) and ".tmp" not in entry.name:
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+def audio_url(path: str):
+    return f"/videos/tts/{os.path.basename(path)}"
@@ -1,19 +1,98 @@
 import re
 import os
+import io
+import numpy as np
 import requests
-from gtts import gTTS
+from requests.adapters import HTTPAdapter
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from moviepy.editor import (
     ImageClip, AudioFileClip, concatenate_videoclips, CompositeAudioClip
 )
+from moviepy.config import get_setting
 import textwrap
 import time
+import json
+import math
+import hashlib
+import subprocess
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from tts_engine import TTS_BACKEND, normalize_voice, synthesize
+
+TEMP_ASSETS_DIR = "temp_video_assets"
+SCENE_CACHE_DIR = os.getenv("SCENE_CACHE_DIR", "scene_cache")
+SCENE_CACHE_MAX_BYTES = int(os.getenv("SCENE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
 
 # Create directories
-os.makedirs("temp_video_assets", exist_ok=True)
+os.makedirs(TEMP_ASSETS_DIR, exist_ok=True)
+os.makedirs(SCENE_CACHE_DIR, exist_ok=True)
+os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
 os.makedirs("generated_videos", exist_ok=True)
 
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
+# Overridable so the fetcher can be pointed at a local stand-in server
+PEXELS_API_URL = os.getenv("PEXELS_API_URL", "https://api.pexels.com/v1/search")
+
+# Image downloads and TTS are network-bound, slide rendering is CPU-bound
+VIDEO_IO_WORKERS = int(os.getenv("VIDEO_IO_WORKERS", "8"))
+VIDEO_RENDER_WORKERS = int(os.getenv("VIDEO_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# "ffmpeg" encodes each slide as a looped still straight from its image and
+# narration; "moviepy" is the original full-frame compositing path
+VIDEO_RENDER_MODE = os.getenv("VIDEO_RENDER_MODE", "ffmpeg")
+VIDEO_STILL_FPS = int(os.getenv("VIDEO_STILL_FPS", "2"))
+VIDEO_X264_PRESET = os.getenv("VIDEO_X264_PRESET", "veryfast")
+FFMPEG_BINARY = get_setting("FFMPEG_BINARY")
+# Seconds before a hung ffmpeg is killed and the job fails
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "600"))
+# Publish each scene to an HLS playlist as soon as it is encoded
+VIDEO_PROGRESSIVE = os.getenv("VIDEO_PROGRESSIVE", "true").lower() == "true"
+# Seconds between forced keyframes, so a long scene can be cut into HLS
+# parts no longer than the playlist's target duration
+VIDEO_KEYFRAME_INTERVAL = int(os.getenv("VIDEO_KEYFRAME_INTERVAL", "2"))
+# Seconds a job's HLS files are kept after its last update; players that
+# started on the stream keep using it after the MP4 is published
+VIDEO_HLS_TTL = float(os.getenv("VIDEO_HLS_TTL", "3600"))
+# Pass slides to the encoder as in-memory frames instead of JPEG files
+VIDEO_RAW_FRAMES = os.getenv("VIDEO_RAW_FRAMES", "false").lower() == "true"
+
+_io_pool = ThreadPoolExecutor(max_workers=VIDEO_IO_WORKERS, thread_name_prefix="video-io")
+# Drives each scene from fetched assets to encoded segment. Kept apart from
+# _io_pool because these tasks block on fetches queued there
+_scene_pool = ThreadPoolExecutor(max_workers=VIDEO_RENDER_WORKERS, thread_name_prefix="video-scene")
+_render_pool = None
+_render_pool_lock = threading.Lock()
+_pexels_session = None
+_pexels_session_lock = threading.Lock()
+_image_cache_lock = threading.Lock()
+_image_fetch_locks = {}
+# (palette, size) -> shared gradient file
+_gradient_paths = {}
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+def _check_cancelled(should_cancel):
+    if should_cancel is not None and should_cancel():
+        raise RenderCancelled()
+
+
+def _get_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=VIDEO_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _render_pool
 
 
 def parse_video_script(script_text):
@@ -118,54 +197,93 @@ def time_to_seconds(time_str):
     return int(parts[0]) * 60 + int(parts[1])
 
 
-def fetch_image_from_pexels(query, index=0):
-    """Fetch image from Pexels with better error handling"""
+def pexels_search_query(query):
+    # Extract keywords from query
+    keywords = query.lower()
+    keywords = re.sub(r'[^\w\s]', '', keywords)  # Remove punctuation
+    words = keywords.split()[:3]  # Take first 3 words
+    return ' '.join(words) if words else 'education'
+
+
+def _get_pexels_session():
+    global _pexels_session
+    with _pexels_session_lock:
+        if _pexels_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=VIDEO_IO_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Authorization"] = PEXELS_API_KEY
+            _pexels_session = session
+        return _pexels_session
+
+
+def _download_pexels_image(search_query, img_path):
+    """Searches Pexels and stores the first hit resized to 1920x1080. Returns False if nothing was found."""
+    session = _get_pexels_session()
+    params = {
+        "query": search_query,
+        "per_page": 5,
+        "orientation": "landscape"
+    }
+    response = session.get(PEXELS_API_URL, params=params, timeout=15)
+    response.raise_for_status()
+    data = response.json()
+
+    if not data.get('photos'):
+        return False
+
+    photo = data['photos'][0]
+    print(f"✅ Found image: {photo.get('alt', 'No description')}")
+
+    # The CDN download doesn't need the API key
+    img_response = session.get(photo['src']['large2x'], headers={"Authorization": None}, timeout=15)
+    img_response.raise_for_status()
+
+    img = Image.open(io.BytesIO(img_response.content)).convert('RGB')
+    img = img.resize((1920, 1080), Image.Resampling.LANCZOS)
+    tmp_path = f"{img_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        img.save(tmp_path, format='JPEG', quality=95)
+        os.replace(tmp_path, img_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def fetch_image_from_pexels(query, index=0, asset_dir=TEMP_ASSETS_DIR):
+    """
+    Fetch image from Pexels with better error handling.
+    Results are cached on disk per search query, already sized for a slide,
+    so repeated topics never hit the network.
+    """
     if not PEXELS_API_KEY:
         print(f"⚠️  No Pexels API key - using gradient for scene {index}")
-        return create_gradient_background(index, query)
+        return create_gradient_background(index, query, asset_dir)
     
     try:
-        # Extract keywords from query
-        keywords = query.lower()
-        keywords = re.sub(r'[^\w\s]', '', keywords)  # Remove punctuation
-        words = keywords.split()[:3]  # Take first 3 words
-        search_query = ' '.join(words) if words else 'education'
-        
-        print(f"🔍 Searching Pexels for: '{search_query}'")
-        
-        url = "https://api.pexels.com/v1/search"
-        headers = {"Authorization": PEXELS_API_KEY}
-        params = {
-            "query": search_query,
-            "per_page": 5,
-            "orientation": "landscape"
-        }
-        
-        response = requests.get(url, headers=headers, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get('photos') and len(data['photos']) > 0:
-            photo = data['photos'][0]
-            img_url = photo['src']['large2x']
-            
-            print(f"✅ Found image: {photo.get('alt', 'No description')}")
-            
-            # Download image
-            img_response = requests.get(img_url, timeout=15)
-            img_response.raise_for_status()
-            
-            img_path = f"temp_video_assets/bg_{index}.jpg"
-            with open(img_path, 'wb') as f:
-                f.write(img_response.content)
-            
-            return img_path
-        else:
-            return create_gradient_background(index, query)
+        search_query = pexels_search_query(query)
+        key = hashlib.sha256(search_query.encode("utf-8")).hexdigest()
+        img_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.jpg")
+
+        with _image_cache_lock:
+            query_lock = _image_fetch_locks.setdefault(key, threading.Lock())
+
+        # Scenes that share a query wait for a single download
+        with query_lock:
+            if os.path.exists(img_path):
+                print(f"♻️  Cached image for: '{search_query}'")
+                return img_path
+
+            print(f"🔍 Searching Pexels for: '{search_query}'")
+            if _download_pexels_image(search_query, img_path):
+                return img_path
+        return create_gradient_background(index, query, asset_dir)
             
     except Exception as e:
         print(f"❌ Pexels error: {e}")
-        return create_gradient_background(index, query)
+        return create_gradient_background(index, query, asset_dir)
 
 
 def get_diagram_prompt(modality):
@@ -182,74 +300,112 @@ def get_diagram_prompt(modality):
         )
 
 
-def create_gradient_background(index, title=""):
-    """Create beautiful gradient backgrounds as fallback"""
-    # Nice gradient color schemes
-    gradients = [
-        [(25, 42, 86), (58, 96, 115)],    # Deep blue
-        [(67, 67, 67), (0, 0, 0)],        # Dark elegant
-        [(30, 60, 114), (42, 82, 152)],   # Professional blue
-        [(72, 52, 212), (130, 72, 210)],  # Purple
-        [(34, 193, 195), (253, 187, 45)], # Teal to gold
-    ]
-    
-    colors = gradients[index % len(gradients)]
-    
-    img = Image.new('RGB', (1920, 1080))
-    draw = ImageDraw.Draw(img)
-    
-    # Create gradient
-    for y in range(1080):
-        ratio = y / 1080
-        r = int(colors[0][0] + (colors[1][0] - colors[0][0]) * ratio)
-        g = int(colors[0][1] + (colors[1][1] - colors[0][1]) * ratio)
-        b = int(colors[0][2] + (colors[1][2] - colors[0][2]) * ratio)
-        draw.line([(0, y), (1920, y)], fill=(r, g, b))
-    
-    img_path = f"temp_video_assets/gradient_{index}.jpg"
-    img.save(img_path, quality=95)
+# Nice gradient color schemes
+GRADIENTS = [
+    [(25, 42, 86), (58, 96, 115)],    # Deep blue
+    [(67, 67, 67), (0, 0, 0)],        # Dark elegant
+    [(30, 60, 114), (42, 82, 152)],   # Professional blue
+    [(72, 52, 212), (130, 72, 210)],  # Purple
+    [(34, 193, 195), (253, 187, 45)], # Teal to gold
+]
+
+
+def gradient_array(colors, size=(1920, 1080)):
+    """Vertical two-colour gradient as an (height, width, 3) uint8 array."""
+    width, height = size
+    start = np.array(colors[0], dtype=np.float64)
+    end = np.array(colors[1], dtype=np.float64)
+    ratio = (np.arange(height, dtype=np.float64) / height)[:, None]
+    rows = (start + (end - start) * ratio).astype(np.uint8)
+    return np.ascontiguousarray(np.broadcast_to(rows[:, None, :], (height, width, 3)))
+
+
+def create_gradient_background(index, title="", asset_dir=TEMP_ASSETS_DIR, size=(1920, 1080)):
+    """
+    Create beautiful gradient backgrounds as fallback.
+    Each palette is rendered once per resolution into IMAGE_CACHE_DIR and
+    the same read-only file is returned to every job after that.
+    """
+    palette = index % len(GRADIENTS)
+    key = (palette, size)
+    with _image_cache_lock:
+        img_path = _gradient_paths.get(key)
+    if img_path is not None:
+        return img_path
+
+    img_path = os.path.join(IMAGE_CACHE_DIR, f"gradient_{palette}_{size[0]}x{size[1]}.jpg")
+    if not os.path.exists(img_path):
+        img = Image.fromarray(gradient_array(GRADIENTS[palette], size), 'RGB')
+        tmp_path = f"{img_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp_path, format='JPEG', quality=95)
+            os.replace(tmp_path, img_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    with _image_cache_lock:
+        _gradient_paths[key] = img_path
     return img_path
 
 
-def create_slide_with_text(bg_image_path, title, content, index):
-    """Create beautiful slides with proper text overlay"""
-    print(f"🎨 Creating slide {index}...")
-    
-    # Load and resize background
+@lru_cache(maxsize=None)
+def load_slide_fonts():
+    """Loads the title and body fonts once per process."""
     try:
-        img = Image.open(bg_image_path)
-        img = img.resize((1920, 1080), Image.Resampling.LANCZOS)
+        # Try different Windows font paths
+        return (
+            ImageFont.truetype("C:/Windows/Fonts/arialbd.ttf", 90),
+            ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 45),
+        )
+    except OSError:
+        try:
+            return ImageFont.truetype("arial.ttf", 90), ImageFont.truetype("arial.ttf", 45)
+        except OSError:
+            print("⚠️  Using default font")
+            return ImageFont.load_default(), ImageFont.load_default()
+
+
+@lru_cache(maxsize=16)
+def _slide_background(bg_image_path, mtime):
+    # mtime is part of the key so a replaced file isn't served stale
+    try:
+        img = Image.open(bg_image_path).convert('RGB')
+        if img.size != (1920, 1080):
+            img = img.resize((1920, 1080), Image.Resampling.LANCZOS)
     except Exception as e:
         print(f"❌ Error loading image: {e}")
         img = Image.new('RGB', (1920, 1080), (30, 30, 50))
-    
+
     # Apply slight blur for better text readability
     img = img.filter(ImageFilter.GaussianBlur(radius=2))
+
+    # Darken in one pass. Visually equivalent to compositing black at alpha
+    # 160, not bit-exact: rounding differs by at most 1 per channel (checked
+    # in bench_slides.py)
+    return Image.blend(img, Image.new('RGB', img.size, (0, 0, 0)), 160 / 255)
+
+
+def slide_background(bg_image_path):
+    """Blurred, darkened 1920x1080 background, shared by every slide that uses the image."""
+    try:
+        mtime = os.path.getmtime(bg_image_path)
+    except (OSError, TypeError):
+        mtime = None
+    return _slide_background(bg_image_path, mtime)
+
+
+def create_slide_with_text(bg_image_path, title, content, index, asset_dir=TEMP_ASSETS_DIR, as_array=False):
+    """
+    Create beautiful slides with proper text overlay.
+    Returns the slide's JPEG path, or an RGB array when as_array is set so
+    the frame can go straight to the encoder.
+    """
+    print(f"🎨 Creating slide {index}...")
     
-    # Convert to RGBA for overlay
-    img = img.convert('RGBA')
-    
-    # Create dark overlay (semi-transparent)
-    overlay = Image.new('RGBA', img.size, (0, 0, 0, 160))
-    img = Image.alpha_composite(img, overlay)
-    
-    # Back to RGB
-    img = img.convert('RGB')
+    img = slide_background(bg_image_path).copy()
     draw = ImageDraw.Draw(img)
-    
-    # Load fonts
-    try:
-        # Try different Windows font paths
-        title_font = ImageFont.truetype("C:/Windows/Fonts/arialbd.ttf", 90)
-        content_font = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 45)
-    except:
-        try:
-            title_font = ImageFont.truetype("arial.ttf", 90)
-            content_font = ImageFont.truetype("arial.ttf", 45)
-        except:
-            print("⚠️  Using default font")
-            title_font = ImageFont.load_default()
-            content_font = ImageFont.load_default()
+    title_font, content_font = load_slide_fonts()
     
     # Draw title with shadow effect
     title_wrapped = textwrap.fill(title, width=30)
@@ -274,60 +430,236 @@ def create_slide_with_text(bg_image_path, title, content, index):
     # Main text
     draw.text((100, content_y), content_wrapped, fill=(220, 220, 220), font=content_font)
     
+    if as_array:
+        print(f"✅ Slide {index} created")
+        return np.asarray(img)
+
     # Save slide
-    slide_path = f"temp_video_assets/slide_{index}.jpg"
+    slide_path = os.path.join(asset_dir, f"slide_{index}.jpg")
     img.save(slide_path, quality=95)
     
     print(f"✅ Slide {index} created")
     return slide_path
 
 
-def generate_voiceover(text, index):
-    """Generate clear voiceover with gTTS"""
-    audio_path = f"temp_video_assets/audio_{index}.mp3"
-    
+def generate_voiceover(text, index, asset_dir=TEMP_ASSETS_DIR):
+    """Generate clear voiceover; identical narration is served from the TTS cache"""
     if not text or text.strip() == "":
         print(f"❌ Scene {index}: No narration text provided!")
         return None
     
+    print(f"🎤 Generating voiceover {index}...")
+    print(f"   Text length: {len(text)} chars")
+    print(f"   Preview: '{text[:80]}...'")
+    
+    cached_path = synthesize(text)
+    if not cached_path:
+        print(f"❌ TTS failed for scene {index}")
+        return None
+
+    # Link the cached file into the job so cache eviction can't remove it
+    # while this render still needs it
+    audio_path = os.path.join(asset_dir, f"audio_{index}{os.path.splitext(cached_path)[1]}")
     try:
-        print(f"🎤 Generating voiceover {index}...")
-        print(f"   Text length: {len(text)} chars")
-        print(f"   Preview: '{text[:80]}...'")
-        
-        tts = gTTS(text=text, lang='en', slow=False)
-        tts.save(audio_path)
-        
-        # Verify file was created and has size
-        if os.path.exists(audio_path):
-            size = os.path.getsize(audio_path)
-            if size > 0:
-                print(f"✅ Audio {index} generated ({size} bytes)")
-                return audio_path
-            else:
-                print(f"❌ Audio file is empty (0 bytes)")
-                return None
-        else:
-            print(f"❌ Audio file was not created at {audio_path}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ TTS error for scene {index}: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        os.link(cached_path, audio_path)
+    except OSError:
+        try:
+            shutil.copyfile(cached_path, audio_path)
+        except OSError:
+            audio_path = cached_path
+    print(f"✅ Audio {index} ready ({os.path.getsize(audio_path)} bytes)")
+    return audio_path
+
+
+def scene_image_query(scene):
+    return scene.get('image_query') if scene.get('image_query') else scene['title']
+
+
+def scene_slide_text(scene):
+    # Fallback to narration if visual_desc is empty
+    return scene['visual_desc'] if scene.get('visual_desc') else scene['narration'][:300]
+
+
+def fetch_scene_assets(scene, index, asset_dir):
+    """Queues one scene's background image and narration on the I/O pool; returns (image_future, audio_future)."""
+    return (
+        _io_pool.submit(fetch_image_from_pexels, scene_image_query(scene), index, asset_dir),
+        _io_pool.submit(generate_voiceover, scene['narration'], index, asset_dir),
+    )
+
+
+def submit_scene_slide(scene, index, asset_dir, image_path):
+    return _get_render_pool().submit(
+        create_slide_with_text, image_path, scene['title'], scene_slide_text(scene), index, asset_dir,
+        as_array=VIDEO_RAW_FRAMES
+    )
+
+
+def is_scene_degraded(scene, image_path, audio_path):
+    """True when a scene fell back to a stand-in image or lost its narration."""
+    return _is_image_fallback(image_path) or (not audio_path and bool(scene['narration'].strip()))
+
+
+def prepare_scene_assets(scenes, asset_dir):
+    """
+    Builds slides and narration for every scene concurrently.
+    Image fetches and TTS run on the I/O pool; each slide is sent to the
+    render process pool as soon as its background is available.
+    Returns (slides, audio_paths, degraded) in order; slides are frame
+    arrays when VIDEO_RAW_FRAMES is on, and degraded marks scenes that
+    fell back to a stand-in image or silence.
+    """
+    fetches = [fetch_scene_assets(scene, i, asset_dir) for i, scene in enumerate(scenes)]
+    image_futures = {image_future: k for k, (image_future, _) in enumerate(fetches)}
+
+    slide_futures = {}
+    for future in as_completed(image_futures):
+        k = image_futures[future]
+        slide_futures[k] = submit_scene_slide(scenes[k], k, asset_dir, future.result())
+
+    slides = [slide_futures[k].result() for k in range(len(scenes))]
+    audio_paths = [audio_future.result() for _, audio_future in fetches]
+    degraded = [
+        is_scene_degraded(scene, image_future.result(), audio_paths[k])
+        for k, (scene, (image_future, _)) in enumerate(zip(scenes, fetches))
+    ]
+    return slides, audio_paths, degraded
+
+
+def build_scene_segment(scene, index, asset_dir, fetch, segment_path):
+    """
+    Renders and encodes one scene as soon as its own image and narration
+    are in, without waiting on the rest of the lesson. Returns whether the
+    scene is degraded (see is_scene_degraded).
+    """
+    image_future, audio_future = fetch
+    image_path = image_future.result()
+    slide = submit_scene_slide(scene, index, asset_dir, image_path).result()
+    audio_path = audio_future.result()
+    if audio_path and not os.path.exists(audio_path):
+        audio_path = None
+    if not audio_path:
+        print(f"⚠️  Scene {index+1} has no audio, using {max(scene['duration'], 5)}s duration")
+    encode_scene_segment(slide, audio_path, max(scene['duration'], 5), segment_path)
+    return is_scene_degraded(scene, image_path, audio_path)
+
+
+def estimate_scene_duration(scene):
+    """
+    Upper estimate of a scene's length before its narration exists, for
+    the HLS target duration. TTS voices speak well above 2 words a second.
+    """
+    return max(scene['duration'], 5, len(scene['narration'].split()) / 2.0)
+
+
+def _is_image_fallback(image_path):
+    # With an API key a gradient means the Pexels lookup failed or found nothing
+    return bool(PEXELS_API_KEY) and os.path.basename(image_path).startswith("gradient_")
+
+
+def scene_cache_key(scene, index):
+    """Hash of everything that affects how a scene segment looks and sounds."""
+    settings = {
+        "mode": VIDEO_RENDER_MODE,
+        "fps": VIDEO_STILL_FPS,
+        "preset": VIDEO_X264_PRESET,
+        "raw_frames": VIDEO_RAW_FRAMES,
+        "keyframe_interval": VIDEO_KEYFRAME_INTERVAL,
+        # Narration uses the backend's default voice (see generate_voiceover)
+        "tts": [TTS_BACKEND, normalize_voice(None)],
+        "size": [1920, 1080],
+        # Without Pexels the background palette depends on scene position
+        "palette": None if PEXELS_API_KEY else index % len(GRADIENTS),
+    }
+    payload = json.dumps([
+        scene['title'],
+        scene_slide_text(scene),
+        scene['narration'],
+        scene_image_query(scene),
+        settings,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _checkout_cached_segment(key, segment_path):
+    """Links a cached segment into the job directory, or returns None on a miss."""
+    cached_path = os.path.join(SCENE_CACHE_DIR, f"{key}.mp4")
+    try:
+        # A link keeps the file usable even if it is evicted mid-job
+        try:
+            os.link(cached_path, segment_path)
+        except OSError:
+            shutil.copyfile(cached_path, segment_path)
+        os.utime(cached_path)
+        return segment_path
+    except FileNotFoundError:
         return None
 
 
-def create_video_from_script(script_text, output_filename="output_video.mp4"):
+def _store_cached_segment(key, segment_path):
+    cached_path = os.path.join(SCENE_CACHE_DIR, f"{key}.mp4")
+    tmp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        shutil.copyfile(segment_path, tmp_path)
+        os.replace(tmp_path, cached_path)
+    except OSError as e:
+        print(f"⚠️  Could not cache scene segment: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def evict_scene_cache(max_bytes=None):
+    """Deletes least recently used segments until the cache fits in max_bytes."""
+    max_bytes = SCENE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for entry in os.scandir(SCENE_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".mp4"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def expire_hls_dirs(max_age=None):
+    """Removes job HLS directories whose playlist hasn't changed for max_age seconds."""
+    max_age = VIDEO_HLS_TTL if max_age is None else max_age
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir("generated_videos"))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir() and os.path.getmtime(os.path.join(entry.path, "playlist.m3u8")) < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def create_video_from_script(script_text, output_filename="output_video.mp4", should_cancel=None, progress=None):
     """
-    Generate video from YOUR LLM's script format
+    Generate video from YOUR LLM's script format.
+    should_cancel is polled between stages; RenderCancelled is raised once it returns True.
+    progress, if given, is called with {"scenes_ready", "scenes_total", "playlist_url"}
+    each time a scene is published to the job's HLS playlist.
     """
     print("\n" + "="*60)
     print("🎬 VIDEO GENERATION STARTED")
     print("="*60 + "\n")
+    expire_hls_dirs()
     
-    # DEBUG: Save the raw script to file
-    debug_path = "temp_video_assets/debug_script.txt"
+    # DEBUG: Save the raw script to file, one per job so concurrent jobs
+    # don't overwrite each other's. Kept only if parsing or rendering fails
+    debug_path = os.path.join(TEMP_ASSETS_DIR, f"debug_{os.path.splitext(output_filename)[0]}.txt")
     with open(debug_path, 'w', encoding='utf-8') as f:
         f.write(script_text)
     print(f"📝 Raw script saved to: {debug_path}")
@@ -336,11 +668,12 @@ def create_video_from_script(script_text, output_filename="output_video.mp4"):
     
     # Parse script
     scenes = parse_video_script(script_text)
+    parsed = bool(scenes)
     
     if not scenes:
         print("❌ PARSING FAILED - No scenes found!")
         print("📋 This usually means the LLM script format doesn't match expected format")
-        print("💡 Check temp_video_assets/debug_script.txt to see what was received")
+        print(f"💡 Check {debug_path} to see what was received (python test_parse.py {debug_path})")
         
         # Emergency fallback: create 1 scene from entire text
         print("\n🚨 FALLBACK MODE: Creating single scene from entire script")
@@ -354,66 +687,314 @@ def create_video_from_script(script_text, output_filename="output_video.mp4"):
         }]
     
     print(f"\n✅ Found {len(scenes)} scenes\n")
+    _check_cancelled(should_cancel)
     
-    video_clips = []
-    
-    for i, scene in enumerate(scenes):
-        print(f"\n--- Scene {i+1}/{len(scenes)}: {scene['title']} ---")
-        
-        # 1. Get background image
-        query_to_use = scene.get('image_query') if scene.get('image_query') else scene['title']
-        bg_image = fetch_image_from_pexels(query_to_use, i)
-        
-        # 2. Create slide
-        # Fallback to narration if visual_desc is empty
-        slide_text = scene['visual_desc'] if scene.get('visual_desc') else scene['narration'][:300]
-        slide_path = create_slide_with_text(
-            bg_image,
-            scene['title'],
-            slide_text,
-            i
+    # Every job gets its own scratch directory so concurrent jobs never
+    # overwrite each other's slides and narration
+    job_dir = tempfile.mkdtemp(prefix="job_", dir=TEMP_ASSETS_DIR)
+    output_path = f"generated_videos/{output_filename}"
+    result = None
+    try:
+        if VIDEO_RENDER_MODE == "moviepy":
+            result = render_moviepy_video(scenes, output_path, job_dir, should_cancel)
+            return result
+        hls_dir = None
+        if VIDEO_PROGRESSIVE:
+            hls_dir = os.path.join("generated_videos", os.path.splitext(output_filename)[0])
+        result = render_ffmpeg_video(scenes, output_path, job_dir, should_cancel, hls_dir, progress)
+        return result
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        if parsed and result:
+            os.remove(debug_path)
+
+
+def _run_ffmpeg(args, input_bytes=None):
+    try:
+        # run() kills the process when the timeout expires
+        result = subprocess.run(
+            [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", *args],
+            input=input_bytes, capture_output=True, timeout=FFMPEG_TIMEOUT
         )
-        
-        # 3. Generate voiceover
-        audio_path = generate_voiceover(scene['narration'], i)
-        
-        # 4. Create video clip
-        if audio_path and os.path.exists(audio_path):
-            try:
-                audio_clip = AudioFileClip(audio_path)
-                duration = audio_clip.duration
-                print(f"📏 Audio duration: {duration:.2f}s")
-                
-                # Create video clip with image
-                video_clip = ImageClip(slide_path, duration=duration)
-                video_clip = video_clip.set_audio(audio_clip)
-                
-                video_clips.append(video_clip)
-                print(f"✅ Scene {i+1} complete")
-                
-            except Exception as e:
-                print(f"❌ Error creating clip {i}: {e}")
-                # Fallback: use default duration
-                video_clip = ImageClip(slide_path, duration=max(scene['duration'], 5))
-                video_clips.append(video_clip)
-        else:
-            # No audio - use duration from script
-            duration = max(scene['duration'], 5)
-            video_clip = ImageClip(slide_path, duration=duration)
-            video_clips.append(video_clip)
-            print(f"⚠️  Scene {i+1} has no audio, using {duration}s duration")
-    
-    if not video_clips:
-        print("❌ No video clips created!")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ffmpeg timed out after {FFMPEG_TIMEOUT:.0f}s")
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpeg failed: {stderr.strip()[-500:]}")
+
+
+def encode_scene_segment(slide, audio_path, duration, segment_path):
+    """
+    Encodes one slide as a single looped frame at a low frame rate, muxed
+    with its narration. Every segment gets identical stream parameters so
+    the segments can be joined without re-encoding.
+    slide is either an image path or an RGB frame array piped in as rawvideo.
+    """
+    input_bytes = None
+    if isinstance(slide, np.ndarray):
+        height, width = slide.shape[:2]
+        args = [
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            "-framerate", str(VIDEO_STILL_FPS), "-i", "pipe:0"
+        ]
+        # A single raw frame is repeated until the narration ends
+        filters = ["-vf", "loop=loop=-1:size=1:start=0"]
+        input_bytes = np.ascontiguousarray(slide, dtype=np.uint8).tobytes()
+    else:
+        args = ["-loop", "1", "-framerate", str(VIDEO_STILL_FPS), "-i", slide]
+        filters = []
+    if audio_path:
+        args += ["-i", audio_path]
+        duration = media_duration(audio_path)
+    else:
+        # Silent track so every segment has the same streams
+        args += ["-f", "lavfi", "-t", str(duration), "-i", "anullsrc=channel_layout=stereo:sample_rate=44100"]
+    if duration:
+        # -shortest alone lets a looped still run up to ~10s past the audio,
+        # since ffmpeg buffers that much before noticing the audio ended
+        filters += ["-t", f"{duration:.3f}"]
+    args += filters + [
+        "-c:v", "libx264", "-tune", "stillimage", "-preset", VIDEO_X264_PRESET,
+        "-r", str(VIDEO_STILL_FPS), "-pix_fmt", "yuv420p",
+        "-force_key_frames", f"expr:gte(t,n_forced*{VIDEO_KEYFRAME_INTERVAL})",
+        "-c:a", "aac", "-b:a", "128k", "-ar", "44100", "-ac", "2",
+        "-shortest", "-movflags", "+faststart",
+        segment_path
+    ]
+    _run_ffmpeg(args, input_bytes)
+    return segment_path
+
+
+def media_duration(path):
+    """Reads a media file's duration in seconds from ffmpeg's probe output."""
+    try:
+        result = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-i", path], capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return None
+    match = re.search(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class HlsPlaylist:
+    """
+    EVENT playlist that grows by each scene's MPEG-TS parts as it is
+    encoded, so players can start on scene 1 while later scenes are still
+    encoding. A scene longer than the target duration is cut into several
+    parts at its forced keyframes.
+    """
+
+    def __init__(self, hls_dir, target_duration):
+        self.hls_dir = hls_dir
+        self.target_duration = target_duration
+        self.path = os.path.join(hls_dir, "playlist.m3u8")
+        self.entries = []
+        self.scenes = 0
+        self.offset = 0.0
+        os.makedirs(hls_dir, exist_ok=True)
+        self._write()
+
+    def add_segment(self, segment_path):
+        scene = self.scenes
+        self.scenes += 1
+        list_path = os.path.join(self.hls_dir, f"scene_{scene}.csv")
+        # Cuts land on the first keyframe after each split point, so a
+        # part runs at most one keyframe interval past it
+        split = max(1, self.target_duration - VIDEO_KEYFRAME_INTERVAL)
+        # Remux only; the offset keeps timestamps continuous across scenes
+        _run_ffmpeg([
+            "-i", segment_path, "-c", "copy", "-f", "segment", "-segment_format", "mpegts",
+            "-segment_time", str(split), "-segment_list", list_path, "-segment_list_type", "csv",
+            "-output_ts_offset", f"{self.offset:.3f}",
+            os.path.join(self.hls_dir, f"scene_{scene}_%03d.ts")
+        ])
+        with open(list_path, encoding="utf-8") as f:
+            parts = [line.strip().rsplit(",", 2) for line in f if line.strip()]
+        os.remove(list_path)
+
+        # End times include the offset, but the first start is listed as 0
+        start = self.offset
+        for ts_name, _, end in parts:
+            duration = float(end) - start
+            start = float(end)
+            if round(duration) > self.target_duration:
+                # Players may stall on a part longer than the target duration
+                raise RuntimeError(
+                    f"HLS part {ts_name} runs {duration:.1f}s, over the {self.target_duration}s target duration"
+                )
+            self.entries.append((duration, ts_name))
+        self.offset = start
+        self._write()
+
+    def finish(self):
+        self._write(ended=True)
+
+    def _write(self, ended=False):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for duration, ts_name in self.entries:
+            lines += [f"#EXTINF:{duration:.3f},", ts_name]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+def concat_segments(segment_paths, output_path, job_dir):
+    list_path = os.path.join(job_dir, "segments.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-movflags", "+faststart", output_path])
+    return output_path
+
+
+def render_ffmpeg_video(scenes, output_path, job_dir, should_cancel=None, hls_dir=None, progress=None):
+    keys = [scene_cache_key(scene, i) for i, scene in enumerate(scenes)]
+    segment_paths = [os.path.join(job_dir, f"segment_{i}.mp4") for i in range(len(scenes))]
+    missing = [
+        i for i, key in enumerate(keys)
+        if _checkout_cached_segment(key, segment_paths[i]) is None
+    ]
+    print(f"♻️  Reusing {len(scenes) - len(missing)}/{len(scenes)} cached scenes")
+
+    # Every scene's fetches are queued up front in lesson order, so later
+    # scenes download in the background while the first ones encode
+    fetches = {i: fetch_scene_assets(scenes[i], i, job_dir) for i in missing}
+    segment_futures = {
+        i: _scene_pool.submit(build_scene_segment, scenes[i], i, job_dir, fetches[i], segment_paths[i])
+        for i in missing
+    }
+
+    try:
+        if missing:
+            print("\n🎞️  Encoding scene segments...")
+
+        playlist = None
+        if hls_dir:
+            # Narration lengths aren't known until TTS finishes, and the
+            # target duration of an EVENT playlist can't change once
+            # published, so it is set from an upper estimate; scenes that
+            # still run longer are split into parts. A looped still can
+            # overrun its audio by up to one frame
+            target_duration = max(
+                math.ceil(max(estimate_scene_duration(scene) for scene in scenes) + 1 / VIDEO_STILL_FPS),
+                VIDEO_KEYFRAME_INTERVAL + 1
+            )
+            playlist = HlsPlaylist(hls_dir, target_duration)
+            playlist_url = f"/videos/{os.path.basename(hls_dir)}/playlist.m3u8"
+
+        # Scenes are published in order, each as soon as it is ready
+        for i in range(len(scenes)):
+            if i in segment_futures:
+                degraded = segment_futures[i].result()
+                # A stand-in image or silent track from a transient failure
+                # must not be served for this scene from now on
+                if not degraded:
+                    _store_cached_segment(keys[i], segment_paths[i])
+                else:
+                    print(f"⚠️  Scene {i+1} used fallback assets, not caching it")
+            _check_cancelled(should_cancel)
+            if playlist is not None:
+                playlist.add_segment(segment_paths[i])
+                print(f"📡 Scene {i+1}/{len(scenes)} published")
+                if progress is not None:
+                    progress({"scenes_ready": i + 1, "scenes_total": len(scenes), "playlist_url": playlist_url})
+        if missing:
+            evict_scene_cache()
+        if playlist is not None:
+            playlist.finish()
+
+        print(f"💾 Exporting to {output_path}...")
+        concat_segments(segment_paths, output_path, job_dir)
+
+        print("\n" + "="*60)
+        print("✅ VIDEO GENERATED SUCCESSFULLY!")
+        print(f"📁 Location: {output_path}")
+        print("="*60 + "\n")
+        return output_path
+
+    except RenderCancelled:
+        if hls_dir:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+        raise
+    except Exception as e:
+        print(f"\n❌ Error assembling video: {e}")
+        import traceback
+        traceback.print_exc()
+        # The client never plays a failed job's stream
+        if hls_dir:
+            shutil.rmtree(hls_dir, ignore_errors=True)
         return None
+    finally:
+        # Don't start work for scenes nobody will publish
+        for future in segment_futures.values():
+            future.cancel()
+        for image_future, audio_future in fetches.values():
+            image_future.cancel()
+            audio_future.cancel()
+
+
+def render_moviepy_video(scenes, output_path, job_dir, should_cancel=None):
+    # 1-3. Fetch images and narration for all scenes at once; each slide is
+    # rendered as soon as its background image arrives
+    slides, audio_paths, _ = prepare_scene_assets(scenes, job_dir)
+    _check_cancelled(should_cancel)
+
+    video_clips = []
+    final_video = None
     
-    # 5. Concatenate all scenes
-    print("\n🎞️  Assembling final video...")
     try:
+        for i, scene in enumerate(scenes):
+            print(f"\n--- Scene {i+1}/{len(scenes)}: {scene['title']} ---")
+            slide = slides[i]
+            audio_path = audio_paths[i]
+            
+            # 4. Create video clip
+            if audio_path and os.path.exists(audio_path):
+                try:
+                    audio_clip = AudioFileClip(audio_path)
+                    duration = audio_clip.duration
+                    print(f"📏 Audio duration: {duration:.2f}s")
+                    
+                    # Create video clip with image
+                    video_clip = ImageClip(slide, duration=duration)
+                    video_clip = video_clip.set_audio(audio_clip)
+                    
+                    video_clips.append(video_clip)
+                    print(f"✅ Scene {i+1} complete")
+                    
+                except Exception as e:
+                    print(f"❌ Error creating clip {i}: {e}")
+                    # Fallback: use default duration
+                    video_clip = ImageClip(slide, duration=max(scene['duration'], 5))
+                    video_clips.append(video_clip)
+            else:
+                # No audio - use duration from script
+                duration = max(scene['duration'], 5)
+                video_clip = ImageClip(slide, duration=duration)
+                video_clips.append(video_clip)
+                print(f"⚠️  Scene {i+1} has no audio, using {duration}s duration")
+        
+        if not video_clips:
+            print("❌ No video clips created!")
+            return None
+        _check_cancelled(should_cancel)
+        
+        # 5. Concatenate all scenes
+        print("\n🎞️  Assembling final video...")
         final_video = concatenate_videoclips(video_clips, method="compose")
         
         # 6. Export
-        output_path = f"generated_videos/{output_filename}"
         print(f"💾 Exporting to {output_path}...")
         
         final_video.write_videofile(
@@ -423,7 +1004,8 @@ def create_video_from_script(script_text, output_filename="output_video.mp4"):
             audio_codec='aac',
             bitrate='5000k',
             preset='medium',
-            threads=4
+            threads=4,
+            temp_audiofile=os.path.join(job_dir, "temp_audio.m4a")
         )
         
         print("\n" + "="*60)
@@ -432,18 +1014,21 @@ def create_video_from_script(script_text, output_filename="output_video.mp4"):
         print(f"⏱️  Duration: {final_video.duration:.2f} seconds")
         print("="*60 + "\n")
         
-        # Cleanup
-        final_video.close()
-        for clip in video_clips:
-            clip.close()
-        
         return output_path
         
+    except RenderCancelled:
+        raise
     except Exception as e:
         print(f"\n❌ Error assembling video: {e}")
         import traceback
         traceback.print_exc()
         return None
+    finally:
+        # Release file handles before the job directory is removed
+        if final_video is not None:
+            final_video.close()
+        for clip in video_clips:
+            clip.close()
 
 
 # Test function
@@ -421,10 +421,19 @@ const handleMicClick = () => {
     const response = await axios.post(`${API_BASE}/upload-pdf`, formData, {
       headers: { "Content-Type": "multipart/form-data" },
     });
-    if (response.data.text) {
-      setPdfContent(response.data.text);
+    // Parsing runs as a background job on the server, poll until it finishes
+    let uploadResult = response.data;
+    while (uploadResult.status === "processing") {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const statusRes = await axios.get(`${API_BASE}/upload-status/${response.data.job_id}`);
+      uploadResult = statusRes.data;
+    }
+    if (uploadResult.text) {
+      setPdfContent(uploadResult.text);
       setUploadedFileName(selectedFile.name);
       setChatHistory([...chatHistory, { sender: "agent", message: "PDF uploaded successfully. Ask me anything about it!" }]);
+    } else if (uploadResult.status === "failed") {
+      setChatHistory([...chatHistory, { sender: "agent", message: `Error uploading PDF: ${uploadResult.error}` }]);
     } else {
       setChatHistory([...chatHistory, { sender: "agent", message: "No text extracted from PDF." }]);
     }
@@ -436,6 +445,72 @@ const handleMicClick = () => {
   }
 };
 
+  // Streams a chat reply from /process-message-stream. Text answers appear
+  // token by token in a temporary bubble, which is removed once the final
+  // result arrives so the normal handling below can render it. Resolves to
+  // { data } shaped like the /process-message response, and falls back to
+  // that endpoint if streaming isn't available.
+  const streamMessage = async (payload) => {
+    const streamId = `stream-${Date.now()}`;
+    let text = "";
+    let showTokens = false;
+    const removeBubble = () =>
+      setChatHistory((prev) => prev.filter((msg) => msg.id !== streamId));
+
+    try {
+      const res = await fetch(`${API_BASE}/process-message-stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload),
+      });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          if (!raw.startsWith("data: ")) continue;
+          const event = JSON.parse(raw.slice(6));
+          if (event.type === "start") {
+            // Video scripts and diagrams are only shown once complete
+            showTokens = ["text", "audio"].includes(event.effective_modality);
+            if (showTokens) {
+              setIsAgentTyping(false);
+              setChatHistory((prev) => [
+                ...prev,
+                { id: streamId, sender: "agent", type: "text", message: "" },
+              ]);
+            }
+          } else if (event.type === "token") {
+            text += event.content;
+            if (showTokens) {
+              setChatHistory((prev) =>
+                prev.map((msg) => (msg.id === streamId ? { ...msg, message: text } : msg))
+              );
+            }
+          } else if (event.type === "done") {
+            removeBubble();
+            return { data: event.result };
+          } else if (event.type === "error") {
+            removeBubble();
+            return { data: { response: event.response } };
+          }
+        }
+      }
+      throw new Error("Stream ended early");
+    } catch (error) {
+      console.warn("Streaming failed, falling back:", error);
+      removeBubble();
+      return axios.post(`${API_BASE}/process-message`, payload);
+    }
+  };
+
   const handleSend = async () => {
     if (!inputMessage.trim()) return;
     setIsAgentTyping(true);
@@ -447,7 +522,7 @@ const handleMicClick = () => {
     ]);
 
     try {
-      const response = await axios.post(`${API_BASE}/process-message`, {
+      const response = await streamMessage({
         message: inputMessage,
         pdfContent: pdfContent || "",
         user_id: activeUser?.user_id || "user_fallback",
@@ -508,18 +583,38 @@ const handleMicClick = () => {
     const pollInterval = setInterval(async () => {
       try {
         const statusRes = await axios.get(`${API_BASE}/video-status/${jobId}`);
+        const progress = statusRes.data.progress;
         if (statusRes.data.status === "completed") {
           clearInterval(pollInterval);
           const finishedVidSrc = statusRes.data.video_url?.startsWith("http") ? statusRes.data.video_url : `${API_BASE}${statusRes.data.video_url}`;
           setChatHistory((prev) => prev.map(msg => 
-            msg.id === tempId ? {
+            msg.id === tempId ? (msg.video_type === HLS_MIME_TYPE ? {
+              // Already streaming the playlist; keep the player as it is
+              ...msg,
+              script: statusRes.data.script
+            } : {
               sender: "agent",
               type: "video",
               video_url: finishedVidSrc,
               script: statusRes.data.script
-            } : msg
+            }) : msg
+          ));
+        } else if (progress && statusRes.data.status === "running") {
+          // Browsers with native HLS can start on the first scenes right away
+          const startStream = progress.scenes_ready > 0 && progress.playlist_url && canPlayHls();
+          setChatHistory((prev) => prev.map(msg =>
+            msg.id === tempId && msg.type === "video_loading" ? (startStream ? {
+              id: tempId,
+              sender: "agent",
+              type: "video",
+              video_url: `${API_BASE}${progress.playlist_url}`,
+              video_type: HLS_MIME_TYPE,
+            } : {
+              ...msg,
+              message: `Generating your video... (${progress.scenes_ready}/${progress.scenes_total} scenes ready)`,
+            }) : msg
           ));
-        } else if (statusRes.data.status === "failed") {
+        } else if (["failed", "cancelled", "not_found"].includes(statusRes.data.status)) {
           clearInterval(pollInterval);
           setChatHistory((prev) => prev.map(msg => 
             msg.id === tempId ? {
@@ -566,8 +661,48 @@ const handleMicClick = () => {
 const videoRef = useRef(null);
 const canvasRef = useRef(null);
 const focusIntervalRef = useRef(null);
+const focusSocketRef = useRef(null);
 const focusDataRef = useRef({ attended: 0, total: 0 });
 
+// Opens the focus WebSocket and starts the session on it. Resolves to the
+// socket once the server confirms, or null if WebSockets aren't available
+// (proxy, older backend), in which case the HTTP endpoints are used instead.
+const openFocusSocket = () => new Promise((resolve) => {
+  let socket;
+  try {
+    socket = new WebSocket(`${API_BASE.replace(/^http/, "ws")}/ws/focus/${encodeURIComponent(activeUser.user_id)}`);
+  } catch (e) {
+    resolve(null);
+    return;
+  }
+  const timer = setTimeout(() => {
+    socket.close();
+    resolve(null);
+  }, 3000);
+  socket.onopen = () => socket.send(JSON.stringify({ type: "start-focus-session" }));
+  socket.onerror = () => {
+    clearTimeout(timer);
+    resolve(null);
+  };
+  socket.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    if (data.type === "started") {
+      clearTimeout(timer);
+      resolve(socket);
+    } else if (data.type === "stopped") {
+      alert(`🧠 Attention Score: ${data.attention_score.toFixed(2)}%`);
+      socket.close();
+    }
+  };
+});
+
+const closeFocusSocket = () => {
+  if (focusSocketRef.current) {
+    focusSocketRef.current.close();
+    focusSocketRef.current = null;
+  }
+};
+
 const startFocus = async () => {
   if (!privacy.eyeTrackingConsent) {
     setPendingFocusStart(true);
@@ -575,12 +710,6 @@ const startFocus = async () => {
     return;
   }
 
-  await axios.post(`${API_BASE}/start-focus-session`, {
-    user_id: activeUser.user_id
-  }, {
-    headers: { "Content-Type": "application/x-www-form-urlencoded" }
-  });
-
   try {
     const stream = await navigator.mediaDevices.getUserMedia({ video: true });
     if (videoRef.current) {
@@ -594,24 +723,46 @@ const startFocus = async () => {
         videoRef.current.style.zIndex = "9999";
         videoRef.current.style.transform = "scaleX(-1)";
     }
-    
-    // start sending frames
-    focusIntervalRef.current = setInterval(() => {
-        if (!videoRef.current || !canvasRef.current) return;
-        const ctx = canvasRef.current.getContext('2d');
-        ctx.drawImage(videoRef.current, 0, 0, canvasRef.current.width, canvasRef.current.height);
-        const dataUrl = canvasRef.current.toDataURL('image/jpeg', 0.5); // lower quality to reduce payload size
-        
-        axios.post(`${API_BASE}/process-frame`, {
-            user_id: activeUser.user_id,
-            image_base64: dataUrl
-        });
-    }, 1000); // 1 frame per second
-    
-    alert("👀 Focus session started with real eye tracking");
   } catch (e) {
+    closeFocusSocket();
     alert("Failed to access webcam");
+    return;
+  }
+
+  // One WebSocket per session: frames go up as binary messages, the live
+  // score and the final result come back as JSON
+  focusSocketRef.current = await openFocusSocket();
+  if (!focusSocketRef.current) {
+    await axios.post(`${API_BASE}/start-focus-session`, {
+      user_id: activeUser.user_id
+    }, {
+      headers: { "Content-Type": "application/x-www-form-urlencoded" }
+    });
   }
+
+  // start sending frames
+  focusIntervalRef.current = setInterval(() => {
+      if (!videoRef.current || !canvasRef.current) return;
+      const ctx = canvasRef.current.getContext('2d');
+      ctx.drawImage(videoRef.current, 0, 0, canvasRef.current.width, canvasRef.current.height);
+      // Send the raw JPEG bytes; lower quality to reduce payload size
+      canvasRef.current.toBlob((blob) => {
+          if (!blob) return;
+          const socket = focusSocketRef.current;
+          if (socket && socket.readyState === WebSocket.OPEN) {
+              socket.send(blob);
+              return;
+          }
+          // The server keeps the session if the socket drops, so frames
+          // can continue over HTTP
+          axios.post(`${API_BASE}/process-frame-binary`, blob, {
+              params: { user_id: activeUser.user_id },
+              headers: { "Content-Type": "application/octet-stream" }
+          });
+      }, 'image/jpeg', 0.5);
+  }, 1000); // 1 frame per second
+  
+  alert("👀 Focus session started with real eye tracking");
 };
 
 const stopFocus = async () => {
@@ -627,6 +778,15 @@ const stopFocus = async () => {
     videoRef.current.style.display = "none";
   }
 
+  const socket = focusSocketRef.current;
+  focusSocketRef.current = null;
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    // The score arrives as a "stopped" message on the socket
+    socket.send(JSON.stringify({ type: "stop-focus-session" }));
+    return;
+  }
+  if (socket) socket.close();
+
   const res = await axios.post(`${API_BASE}/stop-focus-session`, {
     user_id: activeUser.user_id
   }, {
@@ -655,16 +815,13 @@ useEffect(() => {
     ]);
 
     try {
-      const response = await axios.post(
-        `${API_BASE}/process-message`,
-        {
-          message: voiceText,
-          pdfContent: pdfContent || "",
-          user_id: activeUser?.user_id || "user_fallback",
-          modality: "audio", // voice conversations default to audio
-          feedbackGranularity: preferences.feedbackGranularity,
-        }
-      );
+      const response = await streamMessage({
+        message: voiceText,
+        pdfContent: pdfContent || "",
+        user_id: activeUser?.user_id || "user_fallback",
+        modality: "audio", // voice conversations default to audio
+        feedbackGranularity: preferences.feedbackGranularity,
+      });
 
       const answer =
         response.data.response ||
@@ -718,8 +875,7 @@ useEffect(() => {
 };
 const handleNotUnderstood = async (content) => {
   try {
-    const res = await axios.post(
-      `${API_BASE}/process-message`,
+    const res = await streamMessage(
       {
         message: "Explain the concepts in the following content in a much simpler way. If there are multiple concepts, break down each one separately. Use simple language and examples.\n\n" + content,
         pdfContent: content,
@@ -1035,7 +1191,11 @@ const downloadDiagram = (container, filename = "diagram") => {
 };
 // Add this new component inside Chat.js, after AgentMessage component
 
-const VideoMessage = ({ video_url, script }) => {
+const HLS_MIME_TYPE = "application/vnd.apple.mpegurl";
+
+const canPlayHls = () => document.createElement("video").canPlayType(HLS_MIME_TYPE) !== "";
+
+const VideoMessage = ({ video_url, video_type, script }) => {
   const [showScript, setShowScript] = useState(false);
 
   return (
@@ -1075,7 +1235,7 @@ const VideoMessage = ({ video_url, script }) => {
         }}
         aria-label="Generated educational video"
       >
-        <source src={video_url} type="video/mp4" />
+        <source src={video_url} type={video_type || "video/mp4"} />
         Your browser does not support the video tag.
       </video>
 
@@ -1169,7 +1329,7 @@ const VideoMessage = ({ video_url, script }) => {
     {msg.sender === "user" ? (
       <UserMessage content={msg.message} />
     ) : msg.type === "video" ? (
-      <VideoMessage video_url={msg.video_url} script={msg.script} />
+      <VideoMessage video_url={msg.video_url} video_type={msg.video_type} script={msg.script} />
     ) : msg.type === "video_loading" ? (
       <Box sx={{ alignSelf: "flex-start", px: 2, py: 1, mb: 1, display: "flex", alignItems: "center" }}>
         <CircularProgress size={16} sx={{ mr: 1 }} />